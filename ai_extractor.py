@@ -1,70 +1,248 @@
 import os
 import json
-import google.generativeai as genai
 import time
+import queue
+import random
+import asyncio
+import threading
+import concurrent.futures
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from urllib.parse import urlparse
+from rate_limiter import TokenBucket
 
-def extract_business_info(page_text, url):
-    """
-    Uses Google Gemini 1.5 Flash with STRICT rules for Name and Email accuracy.
-    """
-    api_key = os.environ.get('GEMINI_API_KEY')
-
-    # Fail fast if no key
-    if not api_key:
-        return None
-
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-
-        # 1. Extract domain to help AI filter garbage emails
-        # (e.g. if site is eliteplumbing.com, we want emails ending in @eliteplumbing.com)
-        domain = urlparse(url).netloc.replace('www.', '')
-
-        # 2. Limit text to save tokens, but keep enough for footer (where names usually are)
-        # 15k characters is usually enough for the whole homepage.
-        clean_text = page_text[:15000]
-
-        prompt = f"""
-        You are a Data Extraction Expert. Analyze this website text for: {url}
-        Domain: {domain}
-
+EXTRACTION_RULES = """
         Extract the following fields into a JSON object. Follow these STRICT rules:
 
-        1. "business_name": 
+        1. "business_name":
            - Look for the text next to the Copyright symbol (©) in the footer.
            - Look for the main header on the "About Us" section.
            - INVALID NAMES: "Home", "Index", "Welcome", "Page 1", "My Website", "Loading".
            - If unclear, use the domain name formatted as a Title.
 
-        2. "email": 
+        2. "email":
            - Find the best CONTACT email for a sales lead.
-           - PRIORITY: Emails matching the domain @{domain}.
+           - PRIORITY: Emails matching the website's domain.
            - IGNORE: generic hosting emails like 'support@wix.com', 'admin@wordpress.com', 'abuse@'.
            - Return null if only garbage emails are found.
 
-        3. "phone": 
+        3. "phone":
            - The main business phone number formatted cleanly.
 
-        4. "location": 
-           - The full physical address (Street, City, State, Zip). 
+        4. "location":
+           - The full physical address (Street, City, State, Zip).
 
-        5. "industry": 
+        5. "industry":
            - A short 2-3 word classification (e.g. "HVAC Contractor", "Dental Clinic").
+"""
+
 
+def _page_block(page_text, url):
+    # 1. Extract domain to help AI filter garbage emails
+    # (e.g. if site is eliteplumbing.com, we want emails ending in @eliteplumbing.com)
+    domain = urlparse(url).netloc.replace('www.', '')
+
+    # 2. Limit text to save tokens, but keep enough for footer (where names usually are)
+    # 15k characters is usually enough for the whole homepage.
+    clean_text = page_text[:15000]
+
+    return f"""
+        Website: {url}
+        Domain: {domain}
         Website Text:
         {clean_text}
+    """
+
 
+class AIExtractionService:
+    """
+    Process-wide Gemini front-end shared by all scrapers.
+
+    - The model client is configured once and reused.
+    - A token bucket (GEMINI_RPM, GEMINI_BURST) replaces the old fixed sleep,
+      so AI mode runs at the full quota instead of being throttled blindly.
+    - 429/503 responses are retried with exponential backoff, and the bucket is
+      paused so other callers back off too.
+    - With GEMINI_BATCH_SIZE > 1, pages that arrive within GEMINI_BATCH_WAIT
+      seconds of each other are packed into one prompt.
+    """
+
+    def __init__(self):
+        self.model_name = os.environ.get('GEMINI_MODEL', 'gemini-1.5-flash')
+        self.requests_per_minute = int(os.environ.get('GEMINI_RPM', 15))
+        self.burst = int(os.environ.get('GEMINI_BURST', 3))
+        self.max_retries = int(os.environ.get('GEMINI_MAX_RETRIES', 4))
+        self.batch_size = max(1, int(os.environ.get('GEMINI_BATCH_SIZE', 1)))
+        self.batch_wait = float(os.environ.get('GEMINI_BATCH_WAIT', 0.5))
+        self.concurrency = int(os.environ.get('GEMINI_CONCURRENCY', 8))
+
+        self.bucket = TokenBucket.per_minute(self.requests_per_minute, self.burst)
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._model = None
+        self._model_key = None
+        self._queue = None
+        self._executor = None
+
+    def is_configured(self):
+        return bool(os.environ.get('GEMINI_API_KEY'))
+
+    # ---------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------
+    def submit(self, page_text, url):
+        """Queues a page for extraction. Returns a concurrent.futures.Future (dict or None)."""
+        future = concurrent.futures.Future()
+        if not self.is_configured():
+            future.set_result(None)
+            return future
+
+        self._ensure_started()
+        self._queue.put((page_text, url, future))
+        return future
+
+    def extract(self, page_text, url):
+        """Blocking extraction of one page. Returns a dict or None."""
+        try:
+            return self.submit(page_text, url).result()
+        except Exception:
+            return None
+
+    async def aextract(self, page_text, url):
+        """Same as extract(), for coroutines on the fetch engine loop (doesn't tie up a thread)."""
+        try:
+            return await asyncio.wrap_future(self.submit(page_text, url))
+        except Exception:
+            return None
+
+    # ---------------------------------------------------------
+    # Dispatcher: groups queued pages into batches and sends them
+    # ---------------------------------------------------------
+    def _ensure_started(self):
+        with self._lock:
+            if self._queue is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix='gemini'
+            )
+            threading.Thread(target=self._dispatch_loop, name='gemini-dispatch', daemon=True).start()
+
+    def _dispatch_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # One token per prompt, however many pages it carries
+            self.bucket.acquire()
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        try:
+            if len(batch) == 1:
+                page_text, url, future = batch[0]
+                future.set_result(self._extract_one(page_text, url))
+                return
+
+            results = self._extract_many([(page_text, url) for page_text, url, _ in batch])
+            if results is None:
+                # Model didn't return one object per page: fall back to single prompts
+                for page_text, url, future in batch:
+                    self.bucket.acquire()
+                    future.set_result(self._extract_one(page_text, url))
+                return
+
+            for (_, _, future), data in zip(batch, results):
+                future.set_result(data if isinstance(data, dict) else None)
+
+        except Exception:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    # ---------------------------------------------------------
+    # Gemini calls
+    # ---------------------------------------------------------
+    def _get_model(self):
+        api_key = os.environ.get('GEMINI_API_KEY')
+        with self._lock:
+            if self._model is None or self._model_key != api_key:
+                genai.configure(api_key=api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+                self._model_key = api_key
+            return self._model
+
+    def _generate(self, prompt):
+        """Calls Gemini, retrying 429/503 with exponential backoff. Returns parsed JSON."""
+        model = self._get_model()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = model.generate_content(
+                    prompt, generation_config={"response_mime_type": "application/json"}
+                )
+                return json.loads(response.text)
+            except (google_exceptions.TooManyRequests, google_exceptions.ServiceUnavailable):
+                if attempt == self.max_retries:
+                    raise
+                delay = (2 ** attempt) * 2 + random.uniform(0, 1)
+                print(f"Gemini rate limited, retrying in {delay:.1f}s...")
+                self.bucket.pause(delay)
+                time.sleep(delay)
+                self.bucket.acquire()
+
+    def _extract_one(self, page_text, url):
+        prompt = f"""
+        You are a Data Extraction Expert. Analyze this website text.
+        {_page_block(page_text, url)}
+        {EXTRACTION_RULES}
         Return ONLY valid JSON.
         """
+        try:
+            data = self._generate(prompt)
+            return data if isinstance(data, dict) else None
+        except Exception:
+            return None
+
+    def _extract_many(self, pages):
+        blocks = "\n".join(
+            f"        ===== WEBSITE {i + 1} =====\n{_page_block(page_text, url)}"
+            for i, (page_text, url) in enumerate(pages)
+        )
+        prompt = f"""
+        You are a Data Extraction Expert. Analyze each of the {len(pages)} websites below separately.
+        {blocks}
+        For EACH website:
+        {EXTRACTION_RULES}
+        Return ONLY a valid JSON array with exactly {len(pages)} objects, one per website, in the same order.
+        """
+        try:
+            data = self._generate(prompt)
+        except Exception:
+            return None
+        if not isinstance(data, list) or len(data) != len(pages):
+            return None
+        return data
 
-        # Small delay to respect free tier limits (15 Requests Per Minute)
-        time.sleep(2) 
 
-        response = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+ai_service = AIExtractionService()
 
-        return json.loads(response.text)
 
-    except Exception:
-        return None
\ No newline at end of file
+def extract_business_info(page_text, url):
+    """
+    Uses Google Gemini 1.5 Flash with STRICT rules for Name and Email accuracy.
+    Goes through the shared, rate-limited ai_service.
+    """
+    # Fail fast if no key
+    if not ai_service.is_configured():
+        return None
+    return ai_service.extract(page_text, url)
@@ -1,23 +1,22 @@
-import io
 import os
-import pandas as pd
-from datetime import datetime
+import base64
+from datetime import datetime, timedelta
+from sqlalchemy import tuple_
 from functools import wraps
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, flash, session
+from flask import Flask, Response, stream_with_context, render_template, request, jsonify, redirect, url_for, flash, session
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from config import Config
-from models import db, User, Lead
+from models import db, User, Lead, SearchJob, migrate_lead_dedup, ensure_lead_indexes, migrate_search_jobs
 from forms import SignupForm, VerifyOTPForm, LoginForm, ResendOTPForm
 from email_service import email_service
-
-from scrapers.google import GoogleScraper
-from scrapers.social import SocialMediaScraper
+from jobs import search_queue, tail_search_job
 from scrapers.yellow_pages import YellowPagesScraper
-from scrapers.duckduckgo import DuckDuckGoScraper
+import exports
 
 app = Flask(__name__)
 app.config.from_object(Config)
 db.init_app(app)
+search_queue.init_app(app)
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -219,83 +218,186 @@ def logout():
 @login_required
 @approved_required
 def index():
-    user_leads = Lead.query.filter_by(user_id=current_user.id).order_by(Lead.created_at.desc()).all()
-    return render_template('index.html', leads=user_leads)
+    # Leads are loaded page by page from /api/leads as the user scrolls
+    return render_template('index.html')
+
+
+def _encode_cursor(lead):
+    raw = f"{lead.created_at.isoformat()}|{lead.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    created_at, lead_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(lead_id)
+
+
+def _lead_filters(args):
+    """
+    SQL conditions for the current user's leads from query params:
+    source (prefix), location (substring), has_email (1/0),
+    date_from / date_to (YYYY-MM-DD, inclusive). Raises ValueError on bad dates.
+    """
+    conditions = [Lead.user_id == current_user.id]
+
+    source = args.get('source', '').strip()
+    location = args.get('location', '').strip()
+    has_email = args.get('has_email', '').strip().lower()
+    date_from = args.get('date_from', '').strip()
+    date_to = args.get('date_to', '').strip()
+
+    if source:
+        conditions.append(Lead.source.ilike(f"{source}%"))
+    if location:
+        conditions.append(Lead.location.ilike(f"%{location}%"))
+    if has_email in ('1', 'true', 'yes'):
+        conditions.extend([Lead.email.isnot(None), Lead.email != 'N/A'])
+    elif has_email in ('0', 'false', 'no'):
+        conditions.append(db.or_(Lead.email.is_(None), Lead.email == 'N/A'))
+    if date_from:
+        conditions.append(Lead.created_at >= datetime.strptime(date_from, '%Y-%m-%d'))
+    if date_to:
+        conditions.append(Lead.created_at < datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1))
+
+    return conditions
+
+
+@app.route('/api/leads')
+@login_required
+@approved_required
+def list_leads():
+    """
+    Newest-first lead listing with keyset pagination on (created_at, id).
+    Query params: limit (max 500), cursor (from the previous page's next_cursor)
+    plus the filters from _lead_filters().
+    """
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 500)
+    cursor = request.args.get('cursor')
+
+    try:
+        query = Lead.query.filter(*_lead_filters(request.args))
+    except ValueError:
+        return jsonify({"error": "Invalid date filter (use YYYY-MM-DD)."}), 400
+
+    # Only the first page pays for the count
+    total = query.count() if not cursor else None
+
+    if cursor:
+        try:
+            created_at, lead_id = _decode_cursor(cursor)
+        except Exception:
+            return jsonify({"error": "Invalid cursor."}), 400
+        query = query.filter(tuple_(Lead.created_at, Lead.id) < tuple_(created_at, lead_id))
+
+    rows = query.order_by(Lead.created_at.desc(), Lead.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return jsonify({
+        "leads": [dict(lead.to_dict(), id=lead.id) for lead in rows],
+        "next_cursor": _encode_cursor(rows[-1]) if has_more else None,
+        "total": total
+    })
+
+
+def _search_params(data):
+    """
+    The search form as job params. `pages` (Yellow Pages pages per run) is
+    clamped to YP_BATCH_MAX_PAGES. Raises ValueError on a non-numeric page/pages.
+    """
+    page = int(data.get('page') or 1)
+    pages = int(data.get('pages') or 1)
+    return {
+        "query": data.get('query'),
+        "location": data.get('location'),
+        "apiKey": data.get('apiKey'),
+        "cx": data.get('cx'),
+        "platform": data.get('platform', 'google'),
+        "searchMethod": data.get('searchMethod', 'api'),
+        "page": max(1, page),
+        "pages": min(max(1, pages), YellowPagesScraper.BATCH_MAX_PAGES),
+        "sources": data.get('sources')
+    }
 
 
 @app.route('/search', methods=['POST'])
 @login_required
 @approved_required
 def handle_search():
-    data = request.json
-    query = data.get('query')
-    location = data.get('location')
-    api_key = data.get('apiKey')
-    cx = data.get('cx')
-    platform = data.get('platform', 'google')
-    search_method = data.get('searchMethod', 'api') 
-    page = int(data.get('page', 1))
-
-    if not query or not location:
+    data = request.json or {}
+
+    if not data.get('query') or not data.get('location'):
         return jsonify({"error": "Missing query or location."}), 400
 
-    scraper = None
-    new_leads = []
+    try:
+        params = _search_params(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "page and pages must be whole numbers."}), 400
+
+    job_id = search_queue.enqueue(current_user.id, params)
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+
+@app.route('/search/stream/<job_id>')
+@login_required
+@approved_required
+def stream_search_job(job_id):
+    """Server-Sent Events for a queued search: leads and progress as the job saves them."""
+    job = db.session.get(SearchJob, job_id)
+    if not job or job.user_id != current_user.id:
+        return jsonify({"error": "Search job not found."}), 404
+
+    return Response(
+        tail_search_job(app, job_id),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    # Default: No next page (because we fetch all at once for DDG)
-    meta = {"current_page": 1, "has_next": False}
 
-    if platform == 'yellowpages':
-        scraper = YellowPagesScraper()
-        result_data = scraper.search(query, location, api_key, cx, page=page)
+def _get_user_job(job_id):
+    job = search_queue.get(job_id)
+    if not job or job.get('user_id') != current_user.id:
+        return None
+    return job
 
-        if isinstance(result_data, dict) and "error" in result_data:
-            return jsonify(result_data), 400
 
-        new_leads = result_data.get('leads', [])
-        meta = result_data.get('meta', {})
+@app.route('/search/status/<job_id>')
+@login_required
+@approved_required
+def search_status(job_id):
+    job = _get_user_job(job_id)
+    if not job:
+        return jsonify({"error": "Search job not found."}), 404
 
-    elif platform in ['linkedin', 'facebook', 'instagram']:
-        backend_type = 'ddg' if search_method == 'ddg' else 'google'
-        scraper = SocialMediaScraper(platform, backend=backend_type)
-        new_leads = scraper.search(query, location, api_key, cx)
+    return jsonify({
+        "job_id": job_id,
+        "status": job['status'],
+        "error": job.get('error')
+    })
 
-        if isinstance(new_leads, dict) and "error" in new_leads:
-            return jsonify(new_leads), 400
 
-    else: # platform == 'google'
-        if search_method == 'ddg':
-            scraper = DuckDuckGoScraper()
-            # We call search() without relying on 'page' for slicing
-            new_leads = scraper.search(query, location)
+@app.route('/search/result/<job_id>')
+@login_required
+@approved_required
+def search_result(job_id):
+    job = _get_user_job(job_id)
+    if not job:
+        return jsonify({"error": "Search job not found."}), 404
 
-            # Since we got everything possible, there is no next page
-            meta["has_next"] = False
+    if job['status'] == 'failed':
+        return jsonify({"error": job.get('error') or "Search failed."}), 500
 
-        else:
-            scraper = GoogleScraper()
-            new_leads = scraper.search(query, location, api_key, cx)
-
-        if isinstance(new_leads, dict) and "error" in new_leads:
-            return jsonify(new_leads), 400
-
-    for lead_data in new_leads:
-        lead = Lead(
-            user_id=current_user.id,
-            name=lead_data.get('Name', 'Unknown'),
-            email=lead_data.get('Email'),
-            phone=lead_data.get('Phone', 'N/A'),
-            website=lead_data.get('Website'),
-            location=lead_data.get('Location'),
-            source=lead_data.get('Source')
-        )
-        db.session.add(lead)
+    if job['status'] != 'finished':
+        return jsonify({"job_id": job_id, "status": job['status']}), 202
 
-    db.session.commit()
+    result = job.get('result') or {}
+    if "error" in result:
+        return jsonify(result), 400
 
     return jsonify({
-        "leads": new_leads,
-        "meta": meta
+        "leads": result.get('leads', []),
+        "meta": result.get('meta', {}),
+        "new_leads": result.get('new_leads')
     })
 
 
@@ -303,32 +405,52 @@ def handle_search():
 @login_required
 @approved_required
 def handle_download():
-    leads = Lead.query.filter_by(user_id=current_user.id).all()
-
-    if not leads:
+    """
+    Streams the user's leads without loading them all into memory.
+    Query params: format (csv, xlsx, parquet), gzip=1 (csv only),
+    plus the filters from _lead_filters() (source, date_from, date_to, ...).
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'xlsx', 'parquet'):
+        return jsonify({"error": "Unsupported format. Use csv, xlsx or parquet."}), 400
+
+    try:
+        conditions = _lead_filters(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid date filter (use YYYY-MM-DD)."}), 400
+
+    if not db.session.query(Lead.query.filter(*conditions).exists()).scalar():
         flash('No leads to download.', 'warning')
         return redirect(url_for('index'))
 
-    leads_data = [lead.to_dict() for lead in leads]
-    df = pd.DataFrame(leads_data)
-
-    columns = ['Name', 'Email', 'Phone', 'Website', 'Location', 'Source']
-    for col in columns:
-        if col not in df.columns:
-            df[col] = ''
-
-    df = df[columns]
-
-    mem_file = io.BytesIO()
-    df.to_csv(mem_file, index=False, encoding='utf-8')
-    mem_file.seek(0)
+    if export_format == 'csv':
+        compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+        filename = 'leads_export.csv.gz' if compress else 'leads_export.csv'
+        return Response(
+            stream_with_context(exports.csv_stream(conditions, compress=compress)),
+            mimetype='application/gzip' if compress else 'text/csv',
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
 
-    return send_file(
-        mem_file,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name='leads_export.csv'
+    # Columnar formats are built chunk by chunk into a temp file, then streamed from disk
+    if export_format == 'xlsx':
+        path = exports.write_xlsx(conditions)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        path = exports.write_parquet(conditions)
+        mimetype = 'application/vnd.apache.parquet'
+
+    response = Response(
+        exports.file_stream(path),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=leads_export.{export_format}",
+            "Content-Length": str(os.path.getsize(path))
+        }
     )
+    # The server closes every response, even one the client dropped before reading it
+    response.call_on_close(lambda: exports.remove_file(path))
+    return response
 
 
 @app.route('/clear-leads', methods=['POST'])
@@ -503,9 +625,38 @@ def create_superuser():
             print(f"Super admin already exists: {admin_email}")
 
 
-with app.app_context():
+def init_db():
+    """Creates/upgrades the tables and the superuser. Needs an app context."""
     db.create_all()
+    migrate_lead_dedup()
+    ensure_lead_indexes()
+    migrate_search_jobs()
     create_superuser()
 
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Creates/upgrades the database: flask --app app init-db"""
+    init_db()
+
+
+def startup(migrate=None):
+    """
+    Upgrades the database (unless DB_AUTO_MIGRATE is off, then run
+    `flask --app app init-db` once per deploy instead) and re-queues
+    interrupted searches. Called by the entry points (python app.py,
+    worker.py), not on import: spawned parse processes import the main
+    module again.
+    """
+    if migrate is None:
+        migrate = app.config['DB_AUTO_MIGRATE']
+    with app.app_context():
+        if migrate:
+            init_db()
+        # Pick up searches a restart cut short
+        search_queue.resume_interrupted()
+
+
 if __name__ == "__main__":
+    startup()
     app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
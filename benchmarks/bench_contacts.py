@@ -0,0 +1,123 @@
+# benchmarks/bench_contacts.py
+"""
+Micro-benchmark: email/phone recognition with scrapers.contacts against the
+per-call regex helpers the scrapers used before (DuckDuckGoScraper._extract_email
+and friends, reproduced below).
+
+    python benchmarks/bench_contacts.py [--pages 2000] [--words 400] [--repeat 3]
+
+Use e.g. --pages 20000 --words 25 for search-snippet sized texts.
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scrapers.contacts import first_email, first_phone, find_emails, find_phones  # noqa: E402
+
+# ---------------------------------------------------------
+# Previous implementation (raw strings, re-parsed on every call)
+# ---------------------------------------------------------
+LEGACY_EMAIL_REGEX = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-z]{2,10}\b"
+LEGACY_GARBAGE_SUFFIXES = ['None', 'Website', '.Website', 'Contact', 'Email', 'null', 'undefined', 'Tel', 'Phone', 'Fax', 'Hours', 'Home', 'Services', 'About', 'Menu']
+JUNK_DOMAINS = {'example.com', 'sentry.io', 'wixpress.com', 'google.com'}
+
+
+def legacy_extract_email(text):
+    if not text: return None
+    emails = re.findall(LEGACY_EMAIL_REGEX, text, re.IGNORECASE)
+
+    for email in emails:
+        email = email.strip().lstrip('/.:').rstrip('.,;:|')
+        for suffix in LEGACY_GARBAGE_SUFFIXES:
+            if email.endswith(suffix):
+                email = email[:-len(suffix)]
+            match = re.search(r'(\.[a-z]+)([A-Z].*)', email)
+            if match:
+                email = email.replace(match.group(2), "")
+
+        email = email.rstrip('.,;:|')
+        if '@' not in email: continue
+
+        domain = email.split('@')[-1].lower()
+        if domain not in JUNK_DOMAINS:
+            if not email.lower().endswith(('.png', '.jpg', '.gif', '.svg', '.webp')):
+                return email
+    return None
+
+
+def legacy_extract_phone(text):
+    if not text: return None
+    matches = re.findall(r"\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}", text)
+    if matches:
+        return matches[0].strip()
+    return None
+
+
+# ---------------------------------------------------------
+# Synthetic page texts
+# ---------------------------------------------------------
+WORDS = ('plumbing', 'service', 'family', 'owned', 'licensed', 'insured', 'call', 'today',
+         'quote', 'free', 'emergency', 'repair', 'water', 'heater', 'drain', 'since', 'local')
+
+
+def make_texts(count, words_per_page, seed=7):
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        words = [rng.choice(WORDS) for _ in range(words_per_page)]
+        words.insert(rng.randrange(len(words)), f"info@biz{i}.comContact")
+        words.insert(rng.randrange(len(words)), f"({rng.randint(200, 999)}) 555-{rng.randint(1000, 9999)}")
+        if i % 3 == 0:
+            words.insert(rng.randrange(len(words)), "logo@2x.png")
+        texts.append(' '.join(words))
+    return texts
+
+
+def timed(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--words', type=int, default=400, help='words per page text')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    texts = make_texts(args.pages, args.words)
+
+    legacy_time, legacy = timed(
+        lambda: [(legacy_extract_email(t), legacy_extract_phone(t)) for t in texts], args.repeat
+    )
+    single_time, single = timed(
+        lambda: [(first_email(t, JUNK_DOMAINS), first_phone(t)) for t in texts], args.repeat
+    )
+    # All candidates per page
+    all_time, found = timed(
+        lambda: [(find_emails(t, JUNK_DOMAINS), find_phones(t)) for t in texts], args.repeat
+    )
+
+    all_firsts = [(emails[0] if emails else None, phones[0] if phones else None) for emails, phones in found]
+    agree = sum(a == b == c for a, b, c in zip(legacy, single, all_firsts))
+
+    print(f"{args.pages} pages x {args.words} words, best of {args.repeat}")
+    print(f"  legacy per-call : {legacy_time * 1000:8.1f} ms")
+    print(f"  contacts first_*: {single_time * 1000:8.1f} ms  ({legacy_time / single_time:.1f}x)")
+    print(f"  contacts find_* : {all_time * 1000:8.1f} ms  ({legacy_time / all_time:.1f}x)  all candidates")
+    print(f"  same result on {agree}/{len(texts)} pages")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,596 @@
+# benchmarks/bench_scrapers.py
+"""
+End-to-end scraper benchmark against a local mock web, fully offline.
+
+    python benchmarks/bench_scrapers.py [--sites 200] [--latency 50] [--scrapers google,ddg]
+                                        [--json results.json] [--verbose]
+
+A local HTTP server replays the fixtures in benchmarks/fixtures: business sites
+(one virtual host per site, http://<slug>.localhost), YellowPages result and
+profile pages, and canned DDGS / Custom Search JSON. DDGS and the CSE client
+are pointed at that server, YellowPagesScraper.SEARCH_URL too, so
+GoogleScraper, DuckDuckGoScraper, YellowPagesScraper and SocialMediaScraper
+run their real search() end to end without touching the network.
+
+Each scraper runs in its own process, so CPU time and peak RSS are its own
+and the server's work isn't counted. Reported per scraper: sites/sec, p50/p95
+time per site, CPU seconds, peak RSS, and email precision / recall (and phone
+accuracy) against the fixtures' ground truth.
+
+Page cache, proxies and Gemini are off. Politeness pacing and the DDG/CSE quota
+limiters are relaxed so the numbers measure our code rather than the sleeps.
+Anything set in the environment wins, e.g.:
+
+    POLITE_MIN_DELAY=0.25 FETCH_PARSE_PROCESSES=auto python benchmarks/bench_scrapers.py
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import resource
+import argparse
+import threading
+import subprocess
+import urllib.request
+from functools import lru_cache
+from urllib.parse import urlsplit, urlencode, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SCRAPERS = ('google', 'ddg', 'yellowpages', 'social')
+RESULT_PREFIX = 'BENCH_RESULT '
+QUERY, LOCATION = 'plumber', 'Los Angeles, CA'
+
+YP_PAGE_SIZE = 30
+CSE_LIMIT = 100        # CSE never returns more than 10 pages of 10
+SOCIAL_RESULTS = 25    # what SocialMediaScraper asks DDGS for
+
+# Set for the scraper processes unless already in the environment
+BENCH_ENV = {
+    'PAGE_CACHE_ENABLED': 'false',
+    'POLITE_MIN_DELAY': '0',
+    'POLITE_DOMAIN_DELAYS': '',
+    'DDG_QUERIES_PER_MINUTE': '60000',
+    'DDG_QUERY_BURST': '100',
+    'GOOGLE_CSE_QUERIES_PER_MINUTE': '60000',
+    'GOOGLE_CSE_BURST': '100',
+    'YP_BATCH_MAX_PAGES': '1000',
+    'PYTHONWARNINGS': 'ignore',
+}
+
+
+# ---------------------------------------------------------
+# Corpus: fixtures + ground truth
+# ---------------------------------------------------------
+@lru_cache(maxsize=None)
+def load_fixture(path):
+    with open(os.path.join(FIXTURES, path), encoding='utf-8') as f:
+        return f.read()
+
+
+def load_json_fixture(path):
+    return json.loads(load_fixture(path))
+
+
+def render(template, values):
+    for key, value in values.items():
+        template = template.replace('{{%s}}' % key, '' if value is None else str(value))
+    return template
+
+
+def cf_encode(email, key=0x5a):
+    """Cloudflare email protection: a key byte, then every char XOR key, as hex."""
+    return f"{key:02x}" + ''.join(f"{ord(ch) ^ key:02x}" for ch in email)
+
+
+class Business:
+    """One fake business: its site, its listing, and what a scraper should find."""
+    __slots__ = ('index', 'archetype', 'slug', 'name', 'host', 'base', 'email', 'phone',
+                 'site_phone', 'has_website', 'yp_profile_email')
+
+    def __init__(self, index, archetype, name, port, email, phone, site_phone):
+        self.index = index
+        self.archetype = archetype
+        self.slug = f"{archetype['name']}-{index}"
+        self.name = name
+        self.host = f"{self.slug}.localhost"
+        self.base = f"http://{self.host}:{port}"
+        self.email = email
+        self.phone = phone
+        self.site_phone = site_phone
+        # Listing variety: a third of the YP cards have no website, a quarter
+        # show the email on the YP profile page
+        self.has_website = index % 3 != 2
+        self.yp_profile_email = bool(email) and index % 4 == 0
+
+    def values(self):
+        return {"name": self.name, "slug": self.slug, "domain": self.host, "host": self.host,
+                "email": self.email, "phone": self.phone, "index": self.index + 1}
+
+
+def build_corpus(count, port):
+    manifest = load_json_fixture('manifest.json')
+    archetypes = manifest['archetypes']
+    names = manifest['names']
+
+    corpus = []
+    for i in range(count):
+        archetype = archetypes[i % len(archetypes)]
+        slug = f"{archetype['name']}-{i}"
+        values = {"slug": slug, "domain": f"{slug}.localhost", "index4": f"{i % 10000:04d}"}
+        email = render(archetype['email'], values) if archetype.get('email') else None
+        corpus.append(Business(
+            i, archetype, f"{names[i % len(names)]} {i}", port, email,
+            render(manifest['phone'], values), archetype.get('phone', True)
+        ))
+    return corpus
+
+
+def social_templates():
+    return load_json_fixture('search/ddgs_social.json')
+
+
+def expected_contact(business, scraper):
+    """(email, phone) the scraper should report for this business; None where there's nothing to find."""
+    if scraper == 'yellowpages':
+        email = business.email if (business.yp_profile_email or business.has_website) else None
+        return email, business.phone
+    if scraper == 'social':
+        templates = social_templates()
+        has_email = templates[business.index % len(templates)]['has_email']
+        return (business.email if has_email else None), None
+    return business.email, (business.phone if business.site_phone else None)
+
+
+def scope(corpus, scraper):
+    """The businesses a scraper can discover at all."""
+    if scraper == 'google':
+        return corpus[:CSE_LIMIT]
+    if scraper == 'social':
+        return corpus[:SOCIAL_RESULTS]
+    return corpus
+
+
+# ---------------------------------------------------------
+# Mock web
+# ---------------------------------------------------------
+class MockWebHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        host = (self.headers.get('Host') or '').split(':')[0].lower()
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+
+        try:
+            if host in ('127.0.0.1', 'localhost'):
+                if parts.path == '/ddgs/text':
+                    return self._send_json(self._ddgs_text(query))
+                if parts.path == '/cse/v1':
+                    return self._send_json(self._cse_list(query))
+            elif host == 'yp.localhost':
+                if parts.path == '/search':
+                    return self._send_html(self._yp_listing(int(query.get('page', 1))))
+                if parts.path.startswith('/mip/'):
+                    business = self.server.by_slug.get(parts.path[5:].strip('/'))
+                    if business:
+                        return self._send_html(self._yp_profile(business))
+            else:
+                business = self.server.by_slug.get(host.removeprefix('www.').split('.')[0])
+                page = business and self._site_page(business, parts.path)
+                if page:
+                    return self._send_html(page)
+        except Exception as e:
+            return self._send(500, str(e).encode(), 'text/plain')
+
+        self._send(404, b'Not Found', 'text/plain')
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_html(self, html):
+        self._send(200, html.encode('utf-8'), 'text/html; charset=utf-8')
+
+    def _send_json(self, data):
+        self._send(200, json.dumps(data).encode('utf-8'), 'application/json')
+
+    # --- Business sites ---
+    def _site_page(self, business, path):
+        pages = business.archetype['pages']
+        template_path = pages.get(path) or pages.get(path.rstrip('/') + '/') or pages.get(path.rstrip('/') or '/')
+        if not template_path:
+            return None
+        values = business.values()
+        if business.email:
+            values['cfemail'] = cf_encode(business.email)
+        filler = business.archetype.get('filler')
+        if filler:
+            paragraph = load_json_fixture('manifest.json')['filler_paragraph']
+            values['filler'] = '\n'.join(render(paragraph, {"n": n + 1}) for n in range(filler))
+        return render(load_fixture(template_path), values)
+
+    # --- Search APIs ---
+    def _ddgs_text(self, query):
+        corpus = self.server.corpus
+        q = query.get('q', '')
+        max_results = int(query['max_results']) if query.get('max_results') else None
+
+        if 'site:' in q:
+            templates = social_templates()
+            results = []
+            for business in corpus[:max_results or SOCIAL_RESULTS]:
+                template = dict(templates[business.index % len(templates)])
+                template.pop('has_email')
+                results.append({k: render(v, business.values()) for k, v in template.items()})
+            return results
+
+        # Every permutation/backend sees the whole corpus, from a different offset and
+        # with the URL variants real results have (www., tracking params), plus a
+        # directory listing now and then that the junk filter should drop
+        template = load_json_fixture('search/ddgs_text.json')
+        offset = zlib.crc32(f"{q}|{query.get('backend')}".encode()) % max(len(corpus), 1)
+        results = []
+        for n, business in enumerate(corpus[offset:] + corpus[:offset]):
+            if n % 3 == 0:
+                url = f"http://www.{business.host}:{self.server.port}/?utm_source=ddg&utm_medium=organic"
+            else:
+                url = f"{business.base}/"
+            results.append({k: render(v, dict(business.values(), url=url)) for k, v in template.items()})
+            if n % 10 == 9:
+                results.append({"title": f"THE BEST 10 Plumbers near {LOCATION} - Yelp",
+                                "href": f"https://www.yelp.com/search?find_desc=plumber&p={n}",
+                                "body": "Top plumbers near you, with reviews and ratings."})
+        return results[:max_results] if max_results else results
+
+    def _cse_list(self, query):
+        start = int(query.get('start', 1))
+        num = int(query.get('num', 10))
+        visible = self.server.corpus[:CSE_LIMIT]
+        batch = visible[start - 1:start - 1 + num]
+
+        response = {"kind": "customsearch#search",
+                    "searchInformation": {"totalResults": str(len(visible))}}
+        if batch:
+            template = load_json_fixture('search/cse_list.json')
+            response["items"] = [
+                {k: render(v, dict(b.values(), url=f"{b.base}/")) for k, v in template.items()}
+                for b in batch
+            ]
+        return response
+
+    # --- YellowPages ---
+    def _yp_listing(self, page):
+        corpus = self.server.corpus
+        total_pages = max(1, -(-len(corpus) // YP_PAGE_SIZE))
+        card_template = load_fixture('yellowpages/card.html')
+
+        cards = []
+        for business in corpus[(page - 1) * YP_PAGE_SIZE:page * YP_PAGE_SIZE]:
+            website_link = ''
+            if business.has_website:
+                website_link = (f'<a class="track-visit-website" href="{business.base}/?utm_source=yp" '
+                                f'target="_blank" rel="nofollow noopener">Website</a>')
+            cards.append(render(card_template, dict(
+                business.values(),
+                profile_url=f"http://yp.localhost:{self.server.port}/mip/{business.slug}",
+                website_link=website_link
+            )))
+
+        pagination = '\n'.join(
+            f'        <li><a href="/search?page={n}">{n}</a></li>' for n in range(1, total_pages + 1)
+        )
+        return render(load_fixture('yellowpages/search.html'), {"cards": '\n'.join(cards), "pagination": pagination})
+
+    def _yp_profile(self, business):
+        email_block = ''
+        if business.yp_profile_email:
+            email_block = f'      <a class="email-business" href="mailto:{business.email}">Email Business</a>'
+        return render(load_fixture('yellowpages/profile.html'), dict(business.values(), email_block=email_block))
+
+
+class MockWebServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, corpus_size, latency):
+        super().__init__(('127.0.0.1', 0), MockWebHandler)
+        self.port = self.server_address[1]
+        self.latency = latency
+        self.corpus = build_corpus(corpus_size, self.port)
+        self.by_slug = {b.slug: b for b in self.corpus}
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='mock-web', daemon=True).start()
+        return self
+
+
+# ---------------------------------------------------------
+# Stand-ins for the search clients (pointed at the mock web)
+# ---------------------------------------------------------
+def _get_json(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return json.loads(response.read())
+
+
+class MockDDGS:
+    """Takes DDGS's place in scrapers.duckduckgo: same context manager and text() call."""
+    base = None
+    results_served = 0
+
+    def __init__(self, proxy=None, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query, **kwargs):
+        params = {"q": query, "backend": kwargs.get('backend') or 'auto', "max_results": kwargs.get('max_results') or ''}
+        results = _get_json(f"{self.base}/ddgs/text?{urlencode(params)}")
+        MockDDGS.results_served += len(results)
+        return results
+
+
+class MockCSEService:
+    """What get_cse_service() returns: service.cse().list(...).execute(http=...)."""
+
+    def __init__(self, base):
+        self.base = base
+
+    def cse(self):
+        return self
+
+    def list(self, **params):
+        return MockCSERequest(self.base, params)
+
+
+class MockCSERequest:
+    def __init__(self, base, params):
+        self.url = f"{base}/cse/v1?{urlencode(params)}"
+
+    def execute(self, http=None):
+        return _get_json(self.url)
+
+
+# ---------------------------------------------------------
+# One scraper run (child process)
+# ---------------------------------------------------------
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _timed(coro_fn, latencies, skip=None):
+    """
+    Wraps a scraper's per-site coroutine to record how long each site took.
+    Calls for which skip(*args) is true (junk links dropped on sight) aren't counted.
+    """
+    async def _wrapper(*args):
+        started = time.perf_counter()
+        try:
+            return await coro_fn(*args)
+        finally:
+            if not (skip and skip(*args)):
+                latencies.append(time.perf_counter() - started)
+    return _wrapper
+
+
+def score(leads, corpus, scraper):
+    """Email precision / recall and phone accuracy of the leads against the fixtures."""
+    by_slug = {b.slug: b for b in corpus}
+    by_name = {b.name: b for b in corpus}
+
+    def business_for(lead):
+        parts = urlsplit(lead.get('Website') or '')
+        host = (parts.hostname or '').removeprefix('www.')
+        if host.endswith('.localhost'):
+            return by_slug.get(host.split('.')[0])
+        if host.endswith('linkedin.com'):
+            return by_slug.get(parts.path.rstrip('/').rsplit('/', 1)[-1])
+        return by_name.get(lead.get('Name'))
+
+    def digits(value):
+        return ''.join(ch for ch in (value or '') if ch.isdigit())
+
+    with_email = correct = phones_checked = phones_right = 0
+    for lead in leads:
+        business = business_for(lead)
+        email = (lead.get('Email') or '').strip().lower()
+        expected_email, expected_phone = expected_contact(business, scraper) if business else (None, None)
+
+        if email and email != 'n/a':
+            with_email += 1
+            if expected_email and email == expected_email.lower():
+                correct += 1
+        if expected_phone:
+            phones_checked += 1
+            phones_right += digits(lead.get('Phone')) == digits(expected_phone)
+
+    findable = sum(1 for b in scope(corpus, scraper) if expected_contact(b, scraper)[0])
+    return {
+        "precision": correct / with_email if with_email else None,
+        "recall": correct / findable if findable else None,
+        "phone_accuracy": phones_right / phones_checked if phones_checked else None,
+    }
+
+
+def run_worker(scraper, port, sites):
+    sys.path.insert(0, ROOT)
+    import scrapers.duckduckgo as duckduckgo
+    import scrapers.google as google
+    from scrapers import GoogleScraper, DuckDuckGoScraper, YellowPagesScraper, SocialMediaScraper
+    from scrapers.fetcher import fetch_engine
+    from scrapers.filters import junk_filter
+
+    base = f"http://127.0.0.1:{port}"
+    MockDDGS.base = base
+    duckduckgo.DDGS = MockDDGS
+    google.get_cse_service = lambda api_key: MockCSEService(base)
+    YellowPagesScraper.SEARCH_URL = f"http://yp.localhost:{port}/search"
+
+    corpus = build_corpus(sites, port)
+    latencies = []
+    is_junk = junk_filter.is_junk_url
+
+    if scraper == 'google':
+        instance = GoogleScraper()
+        instance._visit_website = _timed(instance._visit_website, latencies, is_junk)
+        call = lambda: instance.search(QUERY, LOCATION, 'bench-key', 'bench-cx')
+    elif scraper == 'ddg':
+        instance = DuckDuckGoScraper()
+        instance._visit_website = _timed(instance._visit_website, latencies, is_junk)
+        call = lambda: instance.search(QUERY, LOCATION)
+    elif scraper == 'yellowpages':
+        instance = YellowPagesScraper()
+        instance._enrich_card = _timed(instance._enrich_card, latencies)
+        pages = max(1, -(-sites // YP_PAGE_SIZE))
+        call = (lambda: instance.search_batch(QUERY, LOCATION, max_pages=pages)) if pages > 1 \
+            else (lambda: instance.search(QUERY, LOCATION))
+    else:
+        # Social runs on search snippets only (DDG backend): no per-site fetches
+        instance = SocialMediaScraper('linkedin', backend='ddg')
+        call = lambda: instance.search(QUERY, LOCATION)
+
+    cpu_before = cpu_seconds()
+    started = time.perf_counter()
+    result = call()
+    wall = time.perf_counter() - started
+
+    # Reap the parse processes (FETCH_PARSE_PROCESSES) so their CPU time is counted
+    pool = getattr(fetch_engine, '_process_pool', None)
+    if pool is not None:
+        pool.shutdown(wait=True)
+    cpu = cpu_seconds() - cpu_before
+
+    if isinstance(result, dict) and 'error' in result:
+        report = {"scraper": scraper, "error": result['error']}
+    else:
+        leads = result.get('leads', []) if isinstance(result, dict) else (result or [])
+        sites_done = len(latencies) if scraper != 'social' else MockDDGS.results_served
+        report = {
+            "scraper": scraper,
+            "sites": sites_done,
+            "leads": len(leads),
+            "wall_s": wall,
+            "sites_per_s": sites_done / wall if wall else None,
+            "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+            "p95_ms": percentile(latencies, 0.95) * 1000 if latencies else None,
+            "cpu_s": cpu,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            **score(leads, corpus, scraper),
+        }
+    print(RESULT_PREFIX + json.dumps(report), flush=True)
+
+
+# ---------------------------------------------------------
+# Driver
+# ---------------------------------------------------------
+def bench_env():
+    env = dict(os.environ)
+    for key, value in BENCH_ENV.items():
+        env.setdefault(key, value)
+    # Offline, always: no Gemini calls and no proxies
+    env.pop('GEMINI_API_KEY', None)
+    env['PROXY_CONFIG_PATH'] = os.path.join(FIXTURES, 'no-proxies.json')
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (ROOT, env.get('PYTHONPATH')) if p)
+    return env
+
+
+def run_scraper(scraper, port, sites, timeout, verbose):
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', scraper, '--port', str(port), '--sites', str(sites)],
+            env=bench_env(), capture_output=True, text=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        return {"scraper": scraper, "error": f"timed out after {timeout}s"}
+
+    if verbose:
+        print(proc.stdout)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    tail = (proc.stderr or proc.stdout).strip().splitlines()[-5:]
+    return {"scraper": scraper, "error": ' | '.join(tail) or f"exit code {proc.returncode}"}
+
+
+def _fmt(value, spec):
+    if value is None:
+        return '-'.rjust(int(spec.split('.')[0]))
+    return format(value, spec)
+
+
+def print_table(results):
+    header = f"{'scraper':<12}{'sites':>7}{'leads':>7}{'wall s':>9}{'sites/s':>9}{'p50 ms':>9}{'p95 ms':>9}" \
+             f"{'cpu s':>8}{'rss MB':>8}{'prec':>7}{'recall':>8}{'phone':>7}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        if 'error' in r:
+            print(f"{r['scraper']:<12}  error: {r['error']}")
+            continue
+        print(f"{r['scraper']:<12}{r['sites']:>7}{r['leads']:>7}{_fmt(r['wall_s'], '9.2f')}"
+              f"{_fmt(r['sites_per_s'], '9.1f')}{_fmt(r['p50_ms'], '9.0f')}{_fmt(r['p95_ms'], '9.0f')}"
+              f"{_fmt(r['cpu_s'], '8.2f')}{_fmt(r['peak_rss_mb'], '8.0f')}{_fmt(r['precision'], '7.2f')}"
+              f"{_fmt(r['recall'], '8.2f')}{_fmt(r['phone_accuracy'], '7.2f')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sites', type=int, default=200, help='businesses in the mock web')
+    parser.add_argument('--latency', type=float, default=50, help='ms the mock server waits before each response')
+    parser.add_argument('--scrapers', default=','.join(SCRAPERS), help='comma-separated: ' + ', '.join(SCRAPERS))
+    parser.add_argument('--timeout', type=int, default=600, help='seconds allowed per scraper')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help="show the scrapers' own output")
+    parser.add_argument('--worker', choices=SCRAPERS, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args.worker, args.port, args.sites)
+
+    scrapers = [s.strip() for s in args.scrapers.split(',') if s.strip()]
+    unknown = [s for s in scrapers if s not in SCRAPERS]
+    if unknown:
+        parser.error(f"unknown scrapers: {', '.join(unknown)}")
+
+    server = MockWebServer(args.sites, args.latency / 1000).start()
+    print(f"{args.sites} sites, {args.latency:.0f} ms server latency, mock web on port {server.port}\n")
+
+    results = []
+    for scraper in scrapers:
+        results.append(run_scraper(scraper, server.port, args.sites, args.timeout, args.verbose))
+    server.shutdown()
+
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"sites": args.sites, "latency_ms": args.latency, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,9 @@ class Config:
 
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///leadscaper.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Upgrade the schema when the web process starts; turn off when several instances
+    # start at once and run `flask --app app init-db` as a release step instead
+    DB_AUTO_MIGRATE = os.environ.get('DB_AUTO_MIGRATE', 'True').lower() == 'true'
     
     # Credentials
     GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY')
@@ -22,6 +25,13 @@ class Config:
     # Redis/RQ Settings
     REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
     REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
-    REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
+    REDIS_URL = os.environ.get('REDIS_URL') or f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
     QUEUES = ['high'] # We can add more, e.g., 'low'
+
+    # Search Jobs
+    SEARCH_JOB_TIMEOUT = int(os.environ.get('SEARCH_JOB_TIMEOUT', 1800))  # seconds
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 3600))  # keep results 1 hour
+    LOCAL_JOB_WORKERS = int(os.environ.get('LOCAL_JOB_WORKERS', 4))  # used when Redis is down
+    SEARCH_RESUME_STALE = int(os.environ.get('SEARCH_RESUME_STALE', 300))  # seconds without a heartbeat before a run counts as dead
+    SEARCH_MAX_ATTEMPTS = int(os.environ.get('SEARCH_MAX_ATTEMPTS', 3))  # runs (first + resumes) per search
     
\ No newline at end of file
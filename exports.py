@@ -0,0 +1,114 @@
+# exports.py
+import io
+import os
+import csv
+import zlib
+import tempfile
+from models import db, Lead
+
+EXPORT_COLUMNS = ['Name', 'Email', 'Phone', 'Website', 'Location', 'Source']
+CHUNK_SIZE = 2000
+
+# Same shape as Lead.to_dict(), straight from the row tuples
+_SELECT_COLUMNS = [Lead.name, Lead.email, Lead.phone, Lead.website, Lead.location, Lead.source]
+
+
+def _clean(row):
+    name, email, phone, website, location, source = row
+    return (name, email or 'N/A', phone, website or 'N/A', location or 'N/A', source or 'N/A')
+
+
+def iter_lead_chunks(conditions, chunk_size=CHUNK_SIZE):
+    """
+    Yields lists of export rows for the leads matching `conditions`.
+    yield_per() uses a server-side cursor on Postgres, so only one chunk
+    is in memory at a time no matter how many leads the user has.
+    """
+    stmt = (
+        db.select(*_SELECT_COLUMNS)
+        .where(*conditions)
+        .order_by(Lead.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for partition in db.session.execute(stmt).partitions():
+        yield [_clean(row) for row in partition]
+
+
+def csv_stream(conditions, compress=False):
+    """Yields the CSV export in chunks, optionally gzip-compressed on the fly."""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 -> gzip container
+
+    def encode(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor else data
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in iter_lead_chunks(conditions):
+        writer.writerows(rows)
+        chunk = encode(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate(0)
+        if chunk:
+            yield chunk
+
+    tail = encode(buffer.getvalue())
+    if compressor:
+        tail += compressor.flush()
+    if tail:
+        yield tail
+
+
+def write_xlsx(conditions):
+    """Writes the export to a temp .xlsx file (openpyxl write-only mode) and returns its path."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Leads')
+    sheet.append(EXPORT_COLUMNS)
+    for rows in iter_lead_chunks(conditions):
+        for row in rows:
+            sheet.append(row)
+
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    workbook.save(path)
+    return path
+
+
+def write_parquet(conditions):
+    """Writes the export to a temp .parquet file, one row group per chunk, and returns its path."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column, pa.string()) for column in EXPORT_COLUMNS])
+    handle, path = tempfile.mkstemp(suffix='.parquet')
+    os.close(handle)
+
+    with pq.ParquetWriter(path, schema, compression='snappy') as writer:
+        for rows in iter_lead_chunks(conditions):
+            columns = list(zip(*rows))
+            writer.write_table(pa.table(
+                {name: pa.array(values, pa.string()) for name, values in zip(EXPORT_COLUMNS, columns)},
+                schema=schema
+            ))
+    return path
+
+
+def file_stream(path, chunk_size=64 * 1024):
+    """Streams a temp export file. Delete it with remove_file() when the response closes."""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        print(f"Could not remove export file {path}: {e}")
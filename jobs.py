@@ -0,0 +1,561 @@
+# jobs.py
+import os
+import json
+import uuid
+import socket
+import threading
+import concurrent.futures
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+from models import db, save_leads, Lead, SearchJob, SearchJobURL, SearchJobLead, add_search_job_urls, add_search_job_leads
+
+from scrapers.google import GoogleScraper
+from scrapers.social import SocialMediaScraper
+from scrapers.yellow_pages import YellowPagesScraper
+from scrapers.duckduckgo import DuckDuckGoScraper
+from scrapers.orchestrator import MultiSourceScraper
+
+
+def run_scraper(params, on_lead=None, on_progress=None, checkpoint=None):
+    """
+    Picks the scraper for the requested platform and runs it.
+    Returns {"leads": [...], "meta": {...}} or {"error": "..."}.
+    on_lead / on_progress are passed to the scraper to stream results as they're found.
+    checkpoint (a SearchCheckpoint) lets the Google/DDG scrapers persist and resume their frontier.
+    """
+    query = params.get('query')
+    location = params.get('location')
+    api_key = params.get('apiKey')
+    cx = params.get('cx')
+    platform = params.get('platform', 'google')
+    search_method = params.get('searchMethod', 'api')
+    page = int(params.get('page', 1))
+    pages = int(params.get('pages', 1))
+
+    # Default: No next page (because we fetch all at once for DDG)
+    meta = {"current_page": 1, "has_next": False}
+
+    if platform == 'yellowpages':
+        scraper = YellowPagesScraper()
+        _attach_hooks(scraper, on_lead, on_progress, checkpoint)
+        if pages > 1:
+            # Batch mode: pages page..page+pages-1 in one job, next listing prefetched
+            result_data = scraper.search_batch(query, location, start_page=page, max_pages=pages)
+        else:
+            result_data = scraper.search(query, location, api_key, cx, page=page)
+
+        if isinstance(result_data, dict) and "error" in result_data:
+            return result_data
+
+        return {"leads": result_data.get('leads', []), "meta": result_data.get('meta', {})}
+
+    if platform == 'multi':
+        # Several sources at once, websites deep-scraped once, leads merged
+        scraper = MultiSourceScraper(params.get('sources'), search_method=search_method, yp_pages=pages)
+        _attach_hooks(scraper, on_lead, on_progress, checkpoint)
+        result_data = scraper.search(query, location, api_key, cx)
+
+        if isinstance(result_data, dict) and "error" in result_data:
+            return result_data
+
+        return {"leads": result_data.get('leads', []), "meta": result_data.get('meta', {})}
+
+    if platform in ['linkedin', 'facebook', 'instagram']:
+        backend_type = 'ddg' if search_method == 'ddg' else 'google'
+        scraper = SocialMediaScraper(platform, backend=backend_type)
+        _attach_hooks(scraper, on_lead, on_progress, checkpoint)
+        new_leads = scraper.search(query, location, api_key, cx)
+
+    elif search_method == 'ddg': # platform == 'google'
+        scraper = DuckDuckGoScraper()
+        _attach_hooks(scraper, on_lead, on_progress, checkpoint)
+        new_leads = scraper.search(query, location)
+
+    else:
+        scraper = GoogleScraper()
+        _attach_hooks(scraper, on_lead, on_progress, checkpoint)
+        new_leads = scraper.search(query, location, api_key, cx)
+
+    if isinstance(new_leads, dict) and "error" in new_leads:
+        return new_leads
+
+    return {"leads": new_leads, "meta": meta}
+
+
+def _attach_hooks(scraper, on_lead, on_progress, checkpoint=None):
+    scraper.on_lead = on_lead
+    scraper.on_progress = on_progress
+    scraper.checkpoint = checkpoint
+
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+class SearchCheckpoint:
+    """
+    Persists one search's progress in search_jobs / search_job_urls as it runs:
+    the sites discovery found, which of them are done (with the lead each one
+    produced), and whether discovery finished. A restarted run load()s this and
+    skips the finished parts. Also keeps the job's heartbeat fresh.
+
+    Only called from the thread running search(), inside an app context.
+    A failed write is logged and skipped; it never stops the search.
+    """
+
+    HEARTBEAT_EVERY = 30  # seconds
+    PROGRESS_EVERY = 1    # seconds between progress writes (the dashboard polls the row)
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last_beat = 0.0
+        self._last_progress = 0.0
+
+    def _write(self, action, fn):
+        try:
+            fn()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Checkpoint {self.job_id}: could not {action}: {e}")
+
+    def load(self):
+        """Returns {"discovery_done": bool, "sites": [{link, title, status, lead}]} or None if nothing was saved."""
+        job = db.session.get(SearchJob, self.job_id)
+        if job is None:
+            return None
+        rows = SearchJobURL.query.filter_by(job_id=self.job_id).order_by(SearchJobURL.id).all()
+        if not rows and not job.discovery_done:
+            return None
+
+        sites = [{
+            "link": row.url,
+            "title": row.title,
+            "status": row.status,
+            "lead": json.loads(row.lead) if row.lead else None
+        } for row in rows]
+        done = sum(1 for site in sites if site['status'] == 'done')
+        print(f"   [checkpoint] Resuming {self.job_id}: {done}/{len(sites)} sites already done"
+              f"{', discovery finished' if job.discovery_done else ''}")
+        return {"discovery_done": bool(job.discovery_done), "sites": sites}
+
+    def add_sites(self, sites):
+        """Adds newly discovered sites to the frontier as pending."""
+        try:
+            add_search_job_urls(self.job_id, sites)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Checkpoint {self.job_id}: could not save frontier: {e}")
+        self.heartbeat()
+
+    def mark_discovered(self):
+        self._write("mark discovery done", lambda: SearchJob.query.filter_by(id=self.job_id).update(
+            {"discovery_done": True, "updated_at": datetime.utcnow()}
+        ))
+
+    def site_done(self, link, lead=None):
+        def _update():
+            SearchJobURL.query.filter_by(job_id=self.job_id, url=link[:500]).update(
+                {"status": "done", "lead": json.dumps(lead) if lead else None}
+            )
+            changes = {"updated_at": datetime.utcnow()}
+            if lead:
+                changes["lead_count"] = SearchJob.lead_count + 1
+            SearchJob.query.filter_by(id=self.job_id).update(changes)
+
+        self._write("mark site done", _update)
+        self._last_beat = time.monotonic()
+
+    def progress(self, completed, total):
+        """Records [completed/total] sites for the status stream (throttled; also a heartbeat)."""
+        now = time.monotonic()
+        if now - self._last_progress < self.PROGRESS_EVERY and completed < total:
+            return
+        self._last_progress = self._last_beat = now
+        self._write("save progress", lambda: SearchJob.query.filter_by(id=self.job_id).update(
+            {"sites_done": completed, "sites_total": total, "updated_at": datetime.utcnow()}
+        ))
+
+    def heartbeat(self):
+        """Marks the job as alive (throttled); a stale heartbeat is what resume looks for."""
+        now = time.monotonic()
+        if now - self._last_beat < self.HEARTBEAT_EVERY:
+            return
+        self._last_beat = now
+        self._write("heartbeat", lambda: SearchJob.query.filter_by(id=self.job_id).update(
+            {"updated_at": datetime.utcnow()}
+        ))
+
+
+def _set_search_job(job_id, **fields):
+    try:
+        fields.setdefault('updated_at', datetime.utcnow())
+        SearchJob.query.filter_by(id=job_id).update(fields)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Could not update search job {job_id}: {e}")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def create_search_job(user_id, params, status='queued'):
+    """Records a new search run and returns its id (also used as the queue job id)."""
+    job_id = uuid.uuid4().hex
+    db.session.add(SearchJob(id=job_id, user_id=user_id, params=json.dumps(params), status=status,
+                             worker=_worker_id() if status == 'running' else None))
+    db.session.commit()
+    return job_id
+
+
+def run_search_job(user_id, params, search_job_id=None):
+    """
+    Job entry point. Runs the scrape and stores the leads for the user.
+    Expects to be called inside an app context (worker.py / SearchQueue).
+
+    Each lead is saved the moment it's found. With a search_job_id it is also
+    appended to the job's search_job_leads, progress goes on the SearchJob row
+    (that's what /search/stream/<job_id> tails), the run is checkpointed, and
+    a run that was cut short resumes from where it stopped.
+    The result carries "new_leads": leads that weren't already in the user's list.
+    """
+    checkpoint = None
+    if search_job_id:
+        checkpoint = SearchCheckpoint(search_job_id)
+        _set_search_job(search_job_id, status='running', worker=_worker_id(),
+                        attempts=SearchJob.attempts + 1)
+
+    # A resumed run restores the earlier attempt's leads; those are recorded already
+    streamed = set()
+    if search_job_id:
+        streamed = {_lead_key(json.loads(row.lead))
+                    for row in SearchJobLead.query.filter_by(job_id=search_job_id)}
+    new_leads = 0
+
+    def on_lead(lead):
+        nonlocal new_leads
+        new_count = save_leads(user_id, [lead])
+        new_leads += new_count
+        key = _lead_key(lead)
+        if search_job_id and key not in streamed:
+            _record_leads(search_job_id, [lead], new_count)
+        streamed.add(key)
+
+    def on_progress(completed, total):
+        if checkpoint:
+            checkpoint.progress(completed, total)
+
+    try:
+        result = run_scraper(params, on_lead=on_lead, on_progress=on_progress, checkpoint=checkpoint)
+    except Exception as e:
+        if search_job_id:
+            _set_search_job(search_job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+        raise
+
+    if "error" in result:
+        if search_job_id:
+            _set_search_job(search_job_id, status='failed', error=result['error'], finished_at=datetime.utcnow())
+        return result
+
+    # Leads restored from a checkpoint (and any a scraper didn't stream) are merged in here
+    new_count = save_leads(user_id, result['leads'])
+    new_leads += new_count
+    if search_job_id:
+        _record_leads(search_job_id, [lead for lead in result['leads'] if _lead_key(lead) not in streamed], new_count)
+        _set_search_job(search_job_id, status='finished', lead_count=len(result['leads']),
+                        meta=json.dumps(result.get('meta', {})), finished_at=datetime.utcnow())
+    return dict(result, new_leads=new_leads)
+
+
+def _lead_key(lead):
+    # What the leads table dedupes on; the same business can arrive as different dicts
+    return Lead.row_from_scraped(None, lead)['dedup_key']
+
+
+def _record_leads(job_id, leads, new_count):
+    try:
+        add_search_job_leads(job_id, leads, new_count)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Could not record leads for search job {job_id}: {e}")
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def tail_search_job(app, job_id, poll_interval=1.0, keepalive=15):
+    """
+    Follows a queued search job and yields Server-Sent Events: 'lead' for each
+    lead it saves, 'progress' with {completed, total}, then 'done' (with meta
+    and new_leads) or 'error'.
+
+    The search itself runs in an RQ worker (or the local job pool); this only
+    reads the SearchJob row and its search_job_leads, so a dropped connection
+    or a web worker restart doesn't touch the search.
+    """
+    last_lead_id = 0
+    last_progress = None
+    last_sent = time.monotonic()
+
+    with app.app_context():
+        while True:
+            job = db.session.get(SearchJob, job_id)
+            if job is None:
+                yield _sse('error', {"error": "Search job not found."})
+                return
+
+            # Status is read before the leads: leads are committed before a job
+            # is marked finished, so a finished job's leads are all in this read
+            status, error = job.status, job.error
+            progress = (job.sites_done or 0, job.sites_total or 0)
+            meta, new_leads = job.meta, job.new_leads or 0
+
+            rows = SearchJobLead.query.filter(
+                SearchJobLead.job_id == job_id, SearchJobLead.id > last_lead_id
+            ).order_by(SearchJobLead.id).all()
+            for row in rows:
+                last_lead_id = row.id
+                last_sent = time.monotonic()
+                yield _sse('lead', json.loads(row.lead))
+
+            if progress != last_progress and progress[1]:
+                last_progress = progress
+                last_sent = time.monotonic()
+                yield _sse('progress', {"completed": progress[0], "total": progress[1]})
+
+            if status == 'finished':
+                yield _sse('done', {"meta": json.loads(meta) if meta else {}, "count": job.lead_count or 0,
+                                    "new_leads": new_leads})
+                return
+            if status == 'failed':
+                yield _sse('error', {"error": error or "Search failed."})
+                return
+
+            if time.monotonic() - last_sent >= keepalive:
+                # Comment line keeps proxies from closing an idle connection
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+
+            # Ends the read transaction: frees the connection and the next poll sees fresh rows
+            db.session.rollback()
+            time.sleep(poll_interval)
+
+
+class SearchQueue:
+    """
+    Hands searches off to RQ workers so the web worker returns immediately.
+    Falls back to a local thread pool when Redis can't be reached.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.rq_queue = None
+        self._executor = None
+        self._local_jobs = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        try:
+            from redis import Redis
+            from rq import Queue
+
+            connection = Redis.from_url(app.config['REDIS_URL'], socket_connect_timeout=2)
+            connection.ping()
+            self.rq_queue = Queue(app.config['QUEUES'][0], connection=connection)
+            print(f"Search jobs -> RQ queue '{self.rq_queue.name}'")
+        except Exception as e:
+            self.rq_queue = None
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=app.config.get('LOCAL_JOB_WORKERS', 4),
+                thread_name_prefix='search-job'
+            )
+            print(f"Redis unavailable ({e}). Running search jobs in-process.")
+
+    def enqueue(self, user_id, params):
+        """Records the search as a SearchJob, queues it and returns its job id."""
+        job_id = create_search_job(user_id, params)
+        self._submit(job_id, user_id, params)
+        return job_id
+
+    def _submit(self, job_id, user_id, params):
+        if self.rq_queue is not None:
+            self.rq_queue.enqueue(
+                run_search_job, user_id, params, job_id,
+                job_id=job_id,
+                job_timeout=Config.SEARCH_JOB_TIMEOUT,
+                result_ttl=Config.JOB_RESULT_TTL,
+                failure_ttl=Config.JOB_RESULT_TTL,
+                meta={'user_id': user_id}
+            )
+            return
+
+        with self._lock:
+            self._prune_local_jobs()
+            self._local_jobs[job_id] = {
+                "status": "queued",
+                "user_id": user_id,
+                "result": None,
+                "error": None,
+                "created_at": datetime.utcnow()
+            }
+        # This process will run it; lets a restart tell the job was orphaned right away
+        _set_search_job(job_id, worker=_worker_id())
+        self._executor.submit(self._run_local, job_id, user_id, params)
+
+    def resume_interrupted(self):
+        """
+        Re-queues searches whose process died mid-run (call once at startup, in an
+        app context). They continue from their checkpoint: finished sites and,
+        if it completed, discovery are not repeated.
+
+        A job counts as orphaned when its worker was on this host and that
+        process is gone, or when its heartbeat is older than SEARCH_RESUME_STALE
+        seconds. Each job is claimed with a compare-and-set on its heartbeat, so
+        when several processes start at once only one of them resumes it.
+        Jobs that already used SEARCH_MAX_ATTEMPTS runs are left alone.
+        """
+        try:
+            candidates = SearchJob.query.filter(
+                SearchJob.status.in_(['queued', 'running']),
+                SearchJob.attempts < Config.SEARCH_MAX_ATTEMPTS
+            ).all()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Could not look for interrupted searches: {e}")
+            return 0
+
+        cutoff = datetime.utcnow() - timedelta(seconds=Config.SEARCH_RESUME_STALE)
+        resumed = 0
+        for job in candidates:
+            if not self._is_orphaned(job, cutoff):
+                continue
+
+            claimed = SearchJob.query.filter_by(id=job.id, updated_at=job.updated_at).update(
+                {"status": "queued", "worker": None, "updated_at": datetime.utcnow()}
+            )
+            db.session.commit()
+            if not claimed:
+                continue
+
+            print(f"Resuming interrupted search {job.id} (attempt {job.attempts + 1})")
+            self._submit(job.id, job.user_id, json.loads(job.params))
+            resumed += 1
+        return resumed
+
+    def _is_orphaned(self, job, cutoff):
+        if job.status == 'queued' and self.rq_queue is not None:
+            # Still waiting in Redis: a worker will get to it
+            from rq.job import Job
+            try:
+                status = Job.fetch(job.id, connection=self.rq_queue.connection).get_status()
+                if getattr(status, 'value', status) in ('queued', 'deferred', 'scheduled'):
+                    return False
+            except Exception:
+                pass
+
+        if job.worker:
+            host, _, pid = job.worker.rpartition(':')
+            if host == socket.gethostname() and pid.isdigit():
+                return int(pid) == os.getpid() or not _pid_alive(int(pid))
+
+        return job.updated_at is None or job.updated_at < cutoff
+
+    def get(self, job_id):
+        """
+        Returns {"id", "status", "user_id", "result", "error"} or None if unknown.
+        Jobs this process doesn't hold (another web worker ran them, or their
+        RQ result expired) are read back from their SearchJob row.
+        """
+        if self.rq_queue is not None:
+            from rq.job import Job
+            from rq.exceptions import NoSuchJobError
+
+            try:
+                job = Job.fetch(job_id, connection=self.rq_queue.connection)
+            except NoSuchJobError:
+                return self._get_recorded(job_id)
+
+            status = job.get_status()
+            status = getattr(status, 'value', status)
+            error = None
+            if status == 'failed':
+                latest = job.latest_result()
+                error = "Search job failed."
+                if latest is not None and latest.exc_string:
+                    error = latest.exc_string.strip().splitlines()[-1]
+            return {
+                "id": job.id,
+                "status": status,
+                "user_id": job.meta.get('user_id'),
+                "result": job.return_value() if status == 'finished' else None,
+                "error": error
+            }
+
+        with self._lock:
+            job = self._local_jobs.get(job_id)
+            if job:
+                return dict(job, id=job_id)
+        return self._get_recorded(job_id)
+
+    def _get_recorded(self, job_id):
+        try:
+            job = db.session.get(SearchJob, job_id)
+            if job is None:
+                return None
+            result = None
+            if job.status == 'finished':
+                result = {
+                    "leads": [json.loads(row.lead) for row in job.leads.order_by(SearchJobLead.id)],
+                    "meta": json.loads(job.meta or '{}'),
+                    "new_leads": job.new_leads
+                }
+            return {
+                "id": job.id,
+                "status": 'started' if job.status == 'running' else job.status,
+                "user_id": job.user_id,
+                "result": result,
+                "error": job.error
+            }
+        except Exception as e:
+            db.session.rollback()
+            print(f"Could not read search job {job_id}: {e}")
+            return None
+
+    def _run_local(self, job_id, user_id, params):
+        self._set_local(job_id, status="started")
+        try:
+            with self.app.app_context():
+                result = run_search_job(user_id, params, job_id)
+            self._set_local(job_id, status="finished", result=result)
+        except Exception as e:
+            print(f"Search job {job_id} failed: {e}")
+            self._set_local(job_id, status="failed", error=str(e))
+
+    def _set_local(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._local_jobs:
+                self._local_jobs[job_id].update(fields)
+
+    def _prune_local_jobs(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=Config.JOB_RESULT_TTL)
+        stale = [
+            job_id for job_id, job in self._local_jobs.items()
+            if job['status'] in ('finished', 'failed') and job['created_at'] < cutoff
+        ]
+        for job_id in stale:
+            del self._local_jobs[job_id]
+
+
+search_queue = SearchQueue()
@@ -1,7 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import insert, update, delete, bindparam, func
+from sqlalchemy.dialects import postgresql, sqlite
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from urllib.parse import urlparse
+import re
+import json
 import secrets
 
 db = SQLAlchemy()
@@ -30,6 +35,7 @@ class User(UserMixin, db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     leads = db.relationship('Lead', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
+    search_jobs = db.relationship('SearchJob', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -99,8 +105,33 @@ class User(UserMixin, db.Model):
         return 'active'
 
 
+def lead_dedup_key(email=None, website=None, name=None, phone=None):
+    """
+    Identity of a lead within one user's list: the lowercased email, else the
+    website's domain (no scheme/www/path), else name + phone digits.
+    """
+    if email and '@' in email and email != 'N/A':
+        return email.strip().lower()[:320]
+
+    if website and website != 'N/A':
+        host = urlparse(website if '//' in website else f"//{website}").netloc.lower()
+        host = host.split('@')[-1].split(':')[0]
+        if host.startswith('www.'):
+            host = host[4:]
+        if host:
+            return f"site:{host}"[:320]
+
+    digits = re.sub(r'\D', '', phone or '')
+    return f"name:{(name or 'unknown').strip().lower()}|{digits}"[:320]
+
+
 class Lead(db.Model):
     __tablename__ = 'leads'
+    __table_args__ = (
+        db.Index('uq_leads_user_dedup', 'user_id', 'dedup_key', unique=True),
+        # Keyset pagination for the dashboard: WHERE user_id = ? AND (created_at, id) < (?, ?)
+        db.Index('ix_leads_user_created_id', 'user_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -111,6 +142,7 @@ class Lead(db.Model):
     website = db.Column(db.String(500), nullable=True)
     location = db.Column(db.String(255), nullable=True)
     source = db.Column(db.String(50), nullable=True)
+    dedup_key = db.Column(db.String(320), nullable=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -123,3 +155,285 @@ class Lead(db.Model):
             'Location': self.location or 'N/A',
             'Source': self.source or 'N/A'
         }
+
+    @staticmethod
+    def row_from_scraped(user_id, lead_data):
+        """Maps a scraper result dict ({'Name': ..., 'Email': ...}) to a leads table row."""
+        row = {
+            'user_id': user_id,
+            'name': lead_data.get('Name') or 'Unknown',
+            'email': lead_data.get('Email'),
+            'phone': lead_data.get('Phone', 'N/A'),
+            'website': lead_data.get('Website'),
+            'location': lead_data.get('Location'),
+            'source': lead_data.get('Source'),
+            'created_at': datetime.utcnow()
+        }
+        row['dedup_key'] = lead_dedup_key(row['email'], row['website'], row['name'], row['phone'])
+        # Scraped text has no length limit; Postgres rejects anything over the column's
+        for column in ('name', 'email', 'phone', 'website', 'location', 'source'):
+            length = Lead.__table__.c[column].type.length
+            if isinstance(row[column], str) and len(row[column]) > length:
+                row[column] = row[column][:length]
+        return row
+
+
+def _is_blank(value):
+    return not value or value == 'N/A'
+
+
+# Columns a repeat lead can fill in; whatever the lead already has is kept
+FILL_COLUMNS = ('phone', 'location', 'website', 'email')
+
+
+def _merge_rows(old, new):
+    """Same lead twice in one batch: keep the first, fill its gaps from the second."""
+    for field in FILL_COLUMNS:
+        if _is_blank(old.get(field)) and not _is_blank(new.get(field)):
+            old[field] = new[field]
+    return old
+
+
+def _upsert_statement():
+    """
+    INSERT ... ON CONFLICT (user_id, dedup_key) DO UPDATE for Postgres/SQLite.
+    A repeat lead keeps its row and its values; incoming phone/location/
+    website/email only fill the ones that are missing ('N/A'/empty), the
+    same first-non-blank-wins rule as _merge_rows().
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(Lead)
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(Lead)
+    else:
+        return insert(Lead)
+
+    def fill(column):
+        existing = getattr(Lead.__table__.c, column)
+        incoming = getattr(stmt.excluded, column)
+        return func.coalesce(
+            func.nullif(func.nullif(existing, 'N/A'), ''),
+            incoming
+        )
+
+    return stmt.on_conflict_do_update(
+        index_elements=['user_id', 'dedup_key'],
+        set_={column: fill(column) for column in FILL_COLUMNS}
+    )
+
+
+def save_leads(user_id, leads, chunk_size=1000):
+    """
+    Bulk-upserts scraped lead dicts for a user and commits.
+    Rows are deduplicated on (user_id, dedup_key), so re-running a search
+    merges into existing leads instead of stacking copies.
+    Uses one executemany statement per chunk (batched into multi-row VALUES
+    on Postgres/SQLite) instead of one ORM object and round trip per lead.
+    Returns how many of them were new, i.e. not merged into an existing lead.
+    """
+    # Postgres refuses to upsert the same key twice in one statement
+    by_key = {}
+    for lead_data in leads:
+        row = Lead.row_from_scraped(user_id, lead_data)
+        if row['dedup_key'] in by_key:
+            _merge_rows(by_key[row['dedup_key']], row)
+        else:
+            by_key[row['dedup_key']] = row
+
+    rows = list(by_key.values())
+    if not rows:
+        return 0
+
+    stmt = _upsert_statement()
+    new_count = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        existing = db.session.query(func.count(Lead.id)).filter(
+            Lead.user_id == user_id, Lead.dedup_key.in_([row['dedup_key'] for row in chunk])
+        ).scalar()
+        new_count += len(chunk) - existing
+        db.session.execute(stmt, chunk)
+
+    db.session.commit()
+    return new_count
+
+
+def migrate_lead_dedup():
+    """
+    One-off upgrade for databases created before leads.dedup_key existed:
+    adds the column, backfills keys, folds duplicate rows into the oldest
+    one (its gaps filled from the others, as save_leads() does) and creates
+    the unique index. Does nothing once the index exists; run it from one
+    process (init_db()), not from every worker.
+    """
+    inspector = db.inspect(db.engine)
+    columns = {c['name'] for c in inspector.get_columns('leads')}
+    indexes = {i['name'] for i in inspector.get_indexes('leads')}
+
+    if 'dedup_key' in columns and 'uq_leads_user_dedup' in indexes:
+        return
+
+    table = Lead.__table__
+    with db.engine.begin() as conn:
+        if 'dedup_key' not in columns:
+            conn.exec_driver_sql("ALTER TABLE leads ADD COLUMN dedup_key VARCHAR(320)")
+
+        rows = conn.execute(
+            db.select(table.c.id, table.c.user_id, table.c.name,
+                      *[table.c[column] for column in FILL_COLUMNS]).order_by(table.c.id)
+        ).all()
+
+        kept = {}
+        keys, duplicates, merged = [], [], {}
+        for row in rows:
+            row = row._asdict()
+            key = lead_dedup_key(row['email'], row['website'], row['name'], row['phone'])
+            if (row['user_id'], key) in kept:
+                duplicates.append(row['id'])
+                survivor = _merge_rows(kept[(row['user_id'], key)], row)
+                merged[survivor['id']] = survivor
+            else:
+                kept[(row['user_id'], key)] = row
+                keys.append({'b_id': row['id'], 'b_key': key})
+
+        for start in range(0, len(duplicates), 1000):
+            conn.execute(delete(table).where(table.c.id.in_(duplicates[start:start + 1000])))
+        if keys:
+            conn.execute(
+                update(table).where(table.c.id == bindparam('b_id')).values(dedup_key=bindparam('b_key')),
+                keys
+            )
+        if merged:
+            # Whatever only a dropped duplicate had (a phone, a location) now lives on the kept row
+            conn.execute(
+                update(table).where(table.c.id == bindparam('b_id')).values(
+                    {column: bindparam(f'b_{column}') for column in FILL_COLUMNS}
+                ),
+                [dict({'b_id': row['id']}, **{f'b_{column}': row[column] for column in FILL_COLUMNS})
+                 for row in merged.values()]
+            )
+
+        conn.exec_driver_sql(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_leads_user_dedup ON leads (user_id, dedup_key)"
+        )
+
+    print(f"Lead dedup migration: keyed {len(keys)} leads, merged and removed {len(duplicates)} duplicates.")
+
+
+def ensure_lead_indexes():
+    """create_all() skips existing tables, so add any index that older databases are missing."""
+    for index in Lead.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+class SearchJob(db.Model):
+    """
+    One search run, kept so a run cut short by a restart can pick up where it
+    stopped. `id` is the queue job id; `worker` is host:pid of the process
+    running it and `updated_at` doubles as its heartbeat.
+    """
+    __tablename__ = 'search_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    params = db.Column(db.Text, nullable=False)  # JSON of the search form
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, running, finished, failed
+    discovery_done = db.Column(db.Boolean, default=False)
+    attempts = db.Column(db.Integer, default=0)
+    lead_count = db.Column(db.Integer, default=0)
+    new_leads = db.Column(db.Integer, default=0)  # leads that weren't already in the user's list
+    sites_done = db.Column(db.Integer, default=0)
+    sites_total = db.Column(db.Integer, default=0)
+    worker = db.Column(db.String(100), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    meta = db.Column(db.Text, nullable=True)  # JSON of the result meta once finished
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    urls = db.relationship('SearchJobURL', backref='job', lazy='dynamic', cascade='all, delete-orphan')
+    leads = db.relationship('SearchJobLead', backref='job', lazy='dynamic', cascade='all, delete-orphan')
+
+
+class SearchJobURL(db.Model):
+    """A site found by a search's discovery step, and whether it has been deep-scraped yet."""
+    __tablename__ = 'search_job_urls'
+    __table_args__ = (
+        db.Index('uq_search_job_urls_job_url', 'job_id', 'url', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), db.ForeignKey('search_jobs.id'), nullable=False, index=True)
+    url = db.Column(db.String(500), nullable=False)
+    title = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(10), default='pending')  # pending, done
+    lead = db.Column(db.Text, nullable=True)  # JSON of the lead it produced, if any
+
+
+class SearchJobLead(db.Model):
+    """A lead a search found, in the order found. The dashboard streams these while the job runs."""
+    __tablename__ = 'search_job_leads'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), db.ForeignKey('search_jobs.id'), nullable=False, index=True)
+    lead = db.Column(db.Text, nullable=False)  # JSON of the lead dict
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def add_search_job_leads(job_id, leads, new_count=0):
+    """Appends leads to a job's result and adds new_count to its new_leads. Commits."""
+    if leads:
+        db.session.execute(insert(SearchJobLead), [
+            {'job_id': job_id, 'lead': json.dumps(lead), 'created_at': datetime.utcnow()} for lead in leads
+        ])
+    if new_count:
+        SearchJob.query.filter_by(id=job_id).update({'new_leads': func.coalesce(SearchJob.new_leads, 0) + new_count})
+    db.session.commit()
+
+
+def migrate_search_jobs():
+    """create_all() skips existing tables, so add any search_jobs column that older databases are missing."""
+    inspector = db.inspect(db.engine)
+    if 'search_jobs' not in inspector.get_table_names():
+        return
+    columns = {c['name'] for c in inspector.get_columns('search_jobs')}
+    missing = [column for column in SearchJob.__table__.columns if column.name not in columns]
+    if not missing:
+        return
+
+    with db.engine.begin() as conn:
+        for column in missing:
+            conn.exec_driver_sql(
+                f"ALTER TABLE search_jobs ADD COLUMN {column.name} {column.type.compile(db.engine.dialect)}"
+            )
+    print(f"Search job migration: added {', '.join(c.name for c in missing)}.")
+
+
+def add_search_job_urls(job_id, sites):
+    """
+    Adds discovered sites ({'link', 'title'}) to a job's frontier as pending.
+    Sites already in the frontier are left as they are. Commits.
+    """
+    rows = [
+        {'job_id': job_id, 'url': site['link'][:500], 'title': (site.get('title') or '')[:255], 'status': 'pending'}
+        for site in sites if site.get('link')
+    ]
+    if not rows:
+        return 0
+
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(SearchJobURL).on_conflict_do_nothing(index_elements=['job_id', 'url'])
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(SearchJobURL).on_conflict_do_nothing(index_elements=['job_id', 'url'])
+    else:
+        known = {url for (url,) in db.session.query(SearchJobURL.url).filter_by(job_id=job_id)}
+        rows = [row for row in rows if row['url'] not in known]
+        stmt = insert(SearchJobURL)
+
+    if rows:
+        db.session.execute(stmt, rows)
+    db.session.commit()
+    return len(rows)
@@ -3,5 +3,6 @@ from .google import GoogleScraper
 from .social import SocialMediaScraper
 from .yellow_pages import YellowPagesScraper
 from .duckduckgo import DuckDuckGoScraper
+from .orchestrator import MultiSourceScraper
 
-__all__ = ['GoogleScraper', 'SocialMediaScraper', 'YellowPagesScraper', 'DuckDuckGoScraper']
\ No newline at end of file
+__all__ = ['GoogleScraper', 'SocialMediaScraper', 'YellowPagesScraper', 'DuckDuckGoScraper', 'MultiSourceScraper']
\ No newline at end of file
@@ -1,6 +1,16 @@
 from abc import ABC, abstractmethod
 
 class BaseScraper(ABC):
+    # Optional hooks for callers that stream results (e.g. the SSE endpoint).
+    # Both are called from the thread running search().
+    on_lead = None      # on_lead(lead_dict)
+    on_progress = None  # on_progress(completed, total)
+    # Set by MultiSourceScraper so a site found by several sources is deep-scraped once
+    site_registry = None
+    # Set by run_search_job: a SearchCheckpoint that scrapers with a discovery
+    # step (Google, DDG) save their URL frontier to and resume from
+    checkpoint = None
+
     @abstractmethod
     def search(self, query, location, api_key=None, cx=None):
         """
@@ -8,4 +18,27 @@ class BaseScraper(ABC):
         Must return a list of dictionaries:
         [{'Name': '...', 'Email': '...', 'Website': '...', 'Location': '...', 'Source': '...'}]
         """
-        pass
\ No newline at end of file
+        pass
+
+    def emit_lead(self, lead):
+        if self.on_lead:
+            try:
+                self.on_lead(lead)
+            except Exception as e:
+                print(f"on_lead callback failed: {e}")
+
+    def emit_progress(self, completed, total):
+        if self.on_progress:
+            try:
+                self.on_progress(completed, total)
+            except Exception as e:
+                print(f"on_progress callback failed: {e}")
+
+    def claim_site(self, url):
+        """
+        True if this scraper should deep-scrape `url`. Always True on its own;
+        in a multi-source search, False when another source already has the site.
+        """
+        if self.site_registry is None:
+            return True
+        return self.site_registry.claim(url, self)
@@ -0,0 +1,146 @@
+# scrapers/cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from .urls import normalize_url
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class PageCache:
+    """
+    Deep-scrape results keyed by (namespace, normalized URL), shared by every
+    search, user and worker process on the box. Stored in a local SQLite file
+    so the scrapers can use it from engine threads without a Flask app context.
+
+    Each row keeps the extracted result (email/phone/name/industry, or None when
+    the site had nothing) and a digest of the fetched HTML. Entries are fresh for
+    PAGE_CACHE_TTL seconds; after that a re-fetch whose HTML digest still matches
+    reuses the old result instead of parsing (and paying Gemini) again.
+    Least recently used rows are evicted once PAGE_CACHE_MAX_ENTRIES is exceeded.
+    """
+
+    EVICT_EVERY = 500  # writes between eviction sweeps
+
+    def __init__(self):
+        self.path = os.environ.get('PAGE_CACHE_PATH') or os.path.join(base_dir, 'instance', 'page_cache.db')
+        self.ttl = int(os.environ.get('PAGE_CACHE_TTL', 7 * 24 * 3600))
+        self.max_entries = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 100000))
+        self.enabled = os.environ.get('PAGE_CACHE_ENABLED', 'true').lower() == 'true'
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS page_cache (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    html_digest TEXT,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_page_cache_accessed ON page_cache (accessed_at)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def namespace(name):
+        """AI and regex runs extract different things, so they get separate entries."""
+        return f"{name}:{'ai' if os.environ.get('GEMINI_API_KEY') else 'regex'}"
+
+    @staticmethod
+    def digest(content):
+        return hashlib.sha1(content or b'').hexdigest()
+
+    @staticmethod
+    def _key(namespace, url):
+        return f"{namespace}|{normalize_url(url)}"
+
+    def get(self, namespace, url):
+        """
+        Returns {"result", "html_digest", "fresh"} or None if the URL was never cached.
+        Stale entries are returned too (fresh=False) so callers can compare digests.
+        """
+        if not self.enabled:
+            return None
+        try:
+            conn = self._connect()
+            key = self._key(namespace, url)
+            row = conn.execute(
+                "SELECT result, html_digest, created_at FROM page_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+
+            now = time.time()
+            conn.execute("UPDATE page_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return {
+                "result": json.loads(row[0]) if row[0] else None,
+                "html_digest": row[1],
+                "fresh": now - row[2] < self.ttl
+            }
+        except Exception as e:
+            print(f"Page cache read error: {e}")
+            return None
+
+    def set(self, namespace, url, result, html_digest=None):
+        """Stores (or refreshes) the result for a URL. `result` may be None for 'nothing found'."""
+        if not self.enabled:
+            return
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                """
+                INSERT INTO page_cache (key, url, html_digest, result, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    html_digest = excluded.html_digest,
+                    result = excluded.result,
+                    created_at = excluded.created_at,
+                    accessed_at = excluded.accessed_at
+                """,
+                (self._key(namespace, url), url, html_digest,
+                 json.dumps(result) if result is not None else None, now, now)
+            )
+            conn.commit()
+
+            with self._lock:
+                self._writes += 1
+                sweep = self._writes % self.EVICT_EVERY == 0
+            if sweep:
+                self.evict()
+        except Exception as e:
+            print(f"Page cache write error: {e}")
+
+    def evict(self):
+        """Drops rows far past their TTL, then the least recently used rows over max_entries."""
+        conn = self._connect()
+        # Keep stale rows around for a while: their digests still save re-parsing
+        conn.execute("DELETE FROM page_cache WHERE created_at < ?", (time.time() - self.ttl * 4,))
+        overflow = conn.execute("SELECT COUNT(*) FROM page_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM page_cache WHERE key IN "
+                "(SELECT key FROM page_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+        conn.commit()
+
+
+page_cache = PageCache()
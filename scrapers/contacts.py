@@ -0,0 +1,150 @@
+# scrapers/contacts.py
+import re
+
+# One pattern for every scraper. The TLD is allowed to run long on purpose:
+# text like "info@acme.comContact" is matched whole and fixed up by clean_email().
+EMAIL_RE = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-z]{2,10}\b", re.IGNORECASE)
+
+# EMAIL_RE split around the '@'. Scanning a page with EMAIL_RE retries the
+# local-part class at every character; finding each '@' with str.find and
+# matching outwards from it gives the same matches for a fraction of the work.
+_LOCAL_RE = re.compile(r"[a-zA-Z0-9._%+-]+")  # run against the reversed text before the '@'
+_DOMAIN_RE = re.compile(r"[a-zA-Z0-9.-]+\.[a-z]{2,10}\b", re.IGNORECASE)
+_MAX_LOCAL = 256
+
+# Same matches as r"\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}", written to start with a
+# character class so the regex engine can skip ahead to candidate positions.
+# Matches never start or end with whitespace, so they need no strip().
+PHONE_RE = re.compile(r"[(\d](?:(?<=\()\d{3}|(?<=\d)\d{2})\)?[\s.-]?\d{3}[\s.-]?\d{4}")
+
+GARBAGE_SUFFIXES = (
+    'None', 'Website', '.Website', 'Contact', 'Email', 'null', 'undefined', 'Tel',
+    'Phone', 'Fax', 'Hours', 'Home', 'Services', 'About', 'Menu'
+)
+# Any run of the words above glued onto the end of the address
+_SUFFIX_RE = re.compile(
+    '(?:' + '|'.join(re.escape(s) for s in sorted(GARBAGE_SUFFIXES, key=len, reverse=True)) + ')+$'
+)
+# ".com" immediately followed by a capitalized word: "acme.comOurServices" -> "acme.com"
+_GLUED_WORD_RE = re.compile(r'(\.[a-z]+)[A-Z].*$')
+
+NOT_EMAIL_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.css', '.js')
+
+
+def iter_raw_emails(text):
+    """Yields (start, match) for every EMAIL_RE match in `text`, left to right."""
+    find = text.find
+    last_end = 0
+    at = find('@')
+    while at != -1:
+        domain = _DOMAIN_RE.match(text, at + 1)
+        if domain:
+            window_start = max(last_end, at - _MAX_LOCAL)
+            local = _LOCAL_RE.match(text[window_start:at][::-1])
+            if local:
+                start = at - local.end()
+                last_end = domain.end()
+                yield start, text[start:last_end]
+                at = find('@', last_end)
+                continue
+        at = find('@', at + 1)
+
+
+def clean_email(raw):
+    """Strips punctuation and words scraped onto an address. Returns None if nothing usable is left."""
+    email = raw.strip().lstrip('/.:').rstrip('.,;:|')
+    glued = _GLUED_WORD_RE.search(email)
+    if glued:
+        email = email[:glued.end(1)]
+    suffix = _SUFFIX_RE.search(email)
+    if suffix:
+        email = email[:suffix.start()]
+    email = email.rstrip('.,;:|')
+    if '@' not in email or email.lower().endswith(NOT_EMAIL_SUFFIXES):
+        return None
+    return email
+
+
+def _filter_emails(raw_emails, junk_domains):
+    emails = []
+    seen = set()
+    for raw in raw_emails:
+        email = clean_email(raw)
+        if not email or email in seen:
+            continue
+        seen.add(email)
+        if junk_domains and email.rsplit('@', 1)[-1].lower() in junk_domains:
+            continue
+        emails.append(email)
+    return emails
+
+
+def find_emails(text, junk_domains=None):
+    """
+    All cleaned, distinct emails in `text`, in order of appearance.
+    `junk_domains` is any container of domains to drop (a set, or filters.junk_filter.domains).
+    """
+    if not text:
+        return []
+    return _filter_emails((raw for _, raw in iter_raw_emails(text)), junk_domains)
+
+
+def first_email(text, junk_domains=None):
+    emails = find_emails(text, junk_domains)
+    return emails[0] if emails else None
+
+
+def find_phones(text):
+    if not text:
+        return []
+    return PHONE_RE.findall(text)
+
+
+def first_phone(text):
+    if not text:
+        return None
+    match = PHONE_RE.search(text)
+    return match.group(0) if match else None
+
+
+# Formatted numbers only ("(555) 123-4567", "555-123-4567", "555.123.4567"): bare
+# digit runs in raw HTML are usually IDs or timestamps, not a sign we have the phone.
+_FORMATTED_PHONE_RE = re.compile(r"\(\d{3}\)\s?\d{3}[\s.-]\d{4}|\b\d{3}[.-]\d{3}[.-]\d{4}\b")
+
+
+class ContactSignalDetector:
+    """
+    Watches a page as it streams in and says when the regex extractors have
+    what they need, so the download can stop early (FetchEngine.fetch's stop_when):
+    an email (on `domain` when given, so a webmaster@agency address in the
+    header doesn't cut the page short) plus, if need_phone, a phone number.
+
+    Pages stopped this way are shorter than the full page, so their cache digest
+    won't match a later full fetch; that only costs a re-parse.
+    """
+    OVERLAP = 256  # chars carried between chunks so a match can straddle them
+
+    def __init__(self, domain=None, need_phone=True, junk_domains=None):
+        domain = (domain or '').lower().split(':')[0]
+        self.domain = domain[4:] if domain.startswith('www.') else domain
+        self.junk_domains = junk_domains
+        self.has_email = False
+        self.has_phone = not need_phone
+        self._tail = ''
+
+    def _is_wanted(self, email):
+        if not self.domain:
+            return True
+        email_domain = email.rsplit('@', 1)[-1].lower()
+        return email_domain == self.domain or email_domain.endswith('.' + self.domain)
+
+    def __call__(self, chunk):
+        text = self._tail + chunk.decode('utf-8', errors='ignore')
+        self._tail = text[-self.OVERLAP:]
+
+        if not self.has_email:
+            self.has_email = any(self._is_wanted(e) for e in find_emails(text, self.junk_domains))
+        if not self.has_phone:
+            self.has_phone = 'tel:' in text or _FORMATTED_PHONE_RE.search(text) is not None
+
+        return self.has_email and self.has_phone
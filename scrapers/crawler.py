@@ -0,0 +1,148 @@
+# scrapers/crawler.py
+import os
+import asyncio
+from urllib.parse import urlparse
+from .fetcher import fetch_engine
+from .html_extract import extract_page
+from .contacts import find_emails, first_phone, ContactSignalDetector
+from .filters import junk_filter
+from .urls import normalize_url, dedup_key
+
+# How strongly a word in the link's path or anchor text suggests contact details
+LINK_WEIGHTS = (
+    ('contact', 10), ('about', 6), ('team', 5), ('staff', 5), ('connect', 4), ('support', 2)
+)
+SKIP_EXTENSIONS = ('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.png', '.jpg', '.jpeg', '.gif', '.zip', '.mp4')
+
+
+def site_domain(url_or_host):
+    """'https://www.acme.com/x' or 'www.acme.com' -> 'acme.com'."""
+    host = urlparse(url_or_host).hostname if '//' in url_or_host else url_or_host
+    host = (host or '').lower().split(':')[0]
+    return host[4:] if host.startswith('www.') else host
+
+
+def site_key(url):
+    """
+    Dedup key for a search result before it is deep-scraped: collapsed per
+    registrable domain (URL_DEDUP_SCOPE) for business sites, but per page on
+    shared platforms, where every profile is a different lead.
+    """
+    if not url or url == "N/A":
+        return None
+    if junk_filter.is_junk_url(url):
+        return dedup_key(url, 'url')
+    return dedup_key(url)
+
+
+def is_site_email(email, domain):
+    """True if the address is on the site's own domain (or a subdomain of it)."""
+    email_domain = email.rsplit('@', 1)[-1].lower()
+    return email_domain == domain or email_domain.endswith('.' + domain)
+
+
+def rank_links(links, home_url, limit):
+    """
+    Picks the `limit` most promising (url, anchor text, in_footer) links from
+    html_extract: contact beats about beats team/staff, footer links get a
+    nudge, and deep paths (/blog/2019/contact-lenses) are pushed down.
+    """
+    seen = {normalize_url(home_url)}
+    scored = []
+    for index, (url, text, in_footer) in enumerate(links):
+        key = normalize_url(url)
+        path = urlparse(url).path.lower()
+        if key in seen or path.endswith(SKIP_EXTENSIONS):
+            continue
+        seen.add(key)
+
+        haystack = f"{path} {text.lower()}"
+        score = sum(weight for word, weight in LINK_WEIGHTS if word in haystack)
+        if in_footer:
+            score += 1
+        score -= 3 * path.strip('/').count('/')
+        scored.append((-score, index, url))
+
+    scored.sort()
+    return [url for _, _, url in scored[:limit]]
+
+
+class SiteCrawler:
+    """
+    Looks past the homepage for contact details. The best-ranked in-site links
+    are fetched concurrently through the shared fetch engine (same session, so
+    connections to the site are reused, and the per-host limit still applies).
+    The crawl stops as soon as an on-site email turns up, or when the
+    per-site page (CRAWL_MAX_PAGES) or time (CRAWL_SITE_BUDGET seconds) budget
+    runs out.
+    """
+
+    def __init__(self):
+        self.max_pages = int(os.environ.get('CRAWL_MAX_PAGES', 3))
+        self.time_budget = float(os.environ.get('CRAWL_SITE_BUDGET', 8))
+
+    async def crawl(self, home_url, links, need_phone=True, max_pages=None, time_budget=None):
+        """
+        Returns {"emails": [...], "phones": [...], "pages": [urls read]}.
+        Emails are cleaned and junk-domain filtered; on-site addresses come first.
+        """
+        result = {"emails": [], "phones": [], "pages": []}
+        targets = rank_links(links or [], home_url, max_pages or self.max_pages)
+        if not targets:
+            return result
+
+        domain = site_domain(home_url)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (time_budget or self.time_budget)
+        tasks = {asyncio.ensure_future(self._read_page(url, domain, need_phone)): url for url in targets}
+        pending = set(tasks)
+
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    try:
+                        page = task.result()
+                    except Exception:
+                        page = None
+                    if not page:
+                        continue
+                    result['pages'].append(tasks[task])
+                    for email in page['emails']:
+                        if email not in result['emails']:
+                            result['emails'].append(email)
+                    if page['phone']:
+                        result['phones'].append(page['phone'])
+
+                if any(is_site_email(email, domain) for email in result['emails']):
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        result['emails'].sort(key=lambda email: not is_site_email(email, domain))
+        return result
+
+    async def _read_page(self, url, domain, need_phone):
+        detector = ContactSignalDetector(domain, need_phone=need_phone, junk_domains=junk_filter.domains)
+        response = await fetch_engine.fetch(url, stop_when=detector)
+        if response.status_code != 200 or not response.content:
+            return None
+        return await fetch_engine.run_cpu(self._scan, response.content)
+
+    @staticmethod
+    def _scan(content):
+        page = extract_page(content)
+        linked = ' '.join(page.mailto + page.cf_emails)
+        return {
+            "emails": find_emails(f"{linked} {page.text}", junk_filter.domains),
+            "phone": first_phone(page.text) or (page.tel[0] if page.tel else None)
+        }
+
+
+site_crawler = SiteCrawler()
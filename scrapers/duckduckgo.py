@@ -1,94 +1,86 @@
 # scrapers/duckduckgo.py
 from ddgs import DDGS
+from ddgs.exceptions import DDGSException, RatelimitException, TimeoutException
 from .base_scraper import BaseScraper
-from curl_cffi import requests
-from bs4 import BeautifulSoup
-import re
-import time
+from .fetcher import fetch_engine
+from .cache import page_cache
+from .html_extract import extract_page
+from .contacts import first_email, first_phone, ContactSignalDetector
+from .filters import junk_filter
+from .crawler import site_crawler, site_domain, site_key, is_site_email
+from .urls import clean_url
+from .proxies import proxy_pool
 import concurrent.futures
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse
 import os
-from ai_extractor import extract_business_info
+import time
+from ai_extractor import ai_service
+from rate_limiter import TokenBucket
+
+# Shared by every DDGS call in the process (DuckDuckGoScraper + SocialMediaScraper),
+# so concurrent discovery queries can't trip DDG's rate limiting.
+ddg_rate_limiter = TokenBucket.per_minute(
+    int(os.environ.get('DDG_QUERIES_PER_MINUTE', 30)),
+    int(os.environ.get('DDG_QUERY_BURST', 4))
+)
+
+
+def ddg_text(query, proxy=None, **kwargs):
+    """
+    One rate-limited DDGS text query, sent through the proxy pool.
+    An explicit `proxy` URL overrides the pool. Raises what DDGS raises.
+    """
+    ddg_rate_limiter.acquire()
+    pooled = None if proxy else proxy_pool.select()
+    started = time.monotonic()
+    try:
+        with DDGS(proxy=proxy or (pooled.url if pooled else None)) as ddgs:
+            results = list(ddgs.text(query, **kwargs))
+    except (RatelimitException, TimeoutException):
+        proxy_pool.report(pooled, False)
+        raise
+    except DDGSException:
+        # "No results found" and the like: not the proxy's fault
+        proxy_pool.report(pooled, True)
+        raise
+    except Exception:
+        proxy_pool.report(pooled, False)
+        raise
+    proxy_pool.report(pooled, True, time.monotonic() - started)
+    return results
 
 class DuckDuckGoScraper(BaseScraper):
-    # Improved Regex: Limits TLD length to 6 chars
-    EMAIL_REGEX = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-z]{2,10}\b"
-
-    # Regex for Phone (Matches common US/International formats)
-    PHONE_REGEX = r"(\+\d{1,2}\s?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}"
-
-    JUNK_DOMAINS = {
-        'duckduckgo.com', 'google.com', 'microsoft.com', 'yahoo.com', 
-        'facebook.com', 'twitter.com', 'instagram.com', 'linkedin.com',
-        'youtube.com', 'w3.org', 'yandex.com', 'wix.com', 'sentry.io',
-        'outlook.office.com', 'accounts.google.com', 'signin.aws.amazon.com',
-        'cloudflare.com', 'github.com', 'wordpress.org', 'gravatar.com',
-        'healthjobsnationwide.com', 'registertovote.ca.gov', 'caring.com',
-        'yelp.com', 'yellowpages.com', 'superpages.com', 'mapquest.com',
-        'ussearch.com', 'webfecto.com', 'cybo.com', 'findbusinessaddress.com'
-    }
-
     JUNK_EXTENSIONS = ('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.png', '.jpg', '.jpeg', '.gif', '.xml', '.zip', '.css', '.js', '.mp4')
-    GARBAGE_SUFFIXES = ['None', 'Website', '.Website', 'Contact', 'Email', 'null', 'undefined', 'Tel', 'Phone', 'Fax', 'Hours', 'Home', 'Services', 'About', 'Menu']
-
-    def _extract_email(self, text):
-        """Extracts and cleans the first valid email found in text."""
-        if not text: return None
-        emails = re.findall(self.EMAIL_REGEX, text, re.IGNORECASE)
-
-        for email in emails:
-            email = email.strip().lstrip('/.:').rstrip('.,;:|')
-            for suffix in self.GARBAGE_SUFFIXES:
-                if email.endswith(suffix):
-                    email = email[:-len(suffix)]
-                match = re.search(r'(\.[a-z]+)([A-Z].*)', email)
-                if match:
-                    email = email.replace(match.group(2), "")
-
-            email = email.rstrip('.,;:|')
-            if '@' not in email: continue
-
-            domain = email.split('@')[-1].lower()
-            if domain not in self.JUNK_DOMAINS:
-                if not email.lower().endswith(('.png', '.jpg', '.gif', '.svg', '.webp')):
-                    return email
-        return None
-
-    def _extract_phone(self, text):
-        """Extracts the first valid looking phone number via Regex."""
-        if not text: return None
-        # Use a simpler regex to grab the most common format (xxx-xxx-xxxx)
-        matches = re.findall(r"\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}", text)
-        if matches:
-            return matches[0].strip()
-        return None
 
-    def _get_page_content(self, url):
+    async def _get_page_content(self, url, stop_when=None):
+        """Fetches a page through the shared engine. Returns the raw HTML or None."""
         try:
-            response = requests.get(
-                url, 
-                impersonate="chrome110", 
-                timeout=10,
-                headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
-            )
-            if response.status_code == 200:
-                return BeautifulSoup(response.content, 'html.parser')
+            response = await fetch_engine.fetch(url, stop_when=stop_when)
+            if response.status_code == 200 and response.content:
+                return response.content
         except Exception:
             pass
         return None
 
-    def _find_contact_link(self, soup, base_url):
-        if not soup: return None
-        keywords = ['contact', 'about', 'team', 'connect', 'support', 'staff']
-        for a in soup.select('a[href]'):
-            href = a['href']
-            text = a.get_text().lower()
-            if href.startswith(('mailto:', 'tel:', 'javascript:', '#')): continue
-            if any(k in text or k in href.lower() for k in keywords):
-                full_url = urljoin(base_url, href)
-                if urlparse(full_url).netloc == urlparse(base_url).netloc:
-                    return full_url
-        return None
+    @staticmethod
+    def _scan_page(content, base_url):
+        """Parses one page and collects regex candidates. Runs on a parse worker (thread or process)."""
+        page = extract_page(content, base_url)
+
+        candidates = set()
+        for raw in page.mailto + page.cf_emails:
+            cleaned = first_email(raw, junk_filter.domains)
+            if cleaned: candidates.add(cleaned)
+
+        text_email = first_email(page.text, junk_filter.domains)
+        if text_email: candidates.add(text_email)
+
+        return {
+            "text": page.text,
+            "emails": candidates,
+            "phone": first_phone(page.text) or (page.tel[0] if page.tel else None),
+            "links": page.contact_links
+        }
 
     def _get_best_email(self, email_list, website_domain):
         if not email_list: return None
@@ -104,78 +96,127 @@ class DuckDuckGoScraper(BaseScraper):
                 return email
         return list(email_list)[0]
 
-    def _visit_website(self, url):
+    async def _visit_website(self, url):
         """Visits website and uses AI (Gemini) or Regex to extract data."""
         if not url or url.lower().endswith(self.JUNK_EXTENSIONS): return None
         try:
             domain = urlparse(url).netloc
-            if any(junk in domain for junk in self.JUNK_DOMAINS): return None
-
-            soup = self._get_page_content(url)
-            if not soup: return None
-
-            page_text = soup.get_text(separator=' ', strip=True)
-
-            # ---------------------------------------------------------
-            # AI MODE: Gemini Integration
-            # ---------------------------------------------------------
-            if os.environ.get('GEMINI_API_KEY'):
-                ai_data = extract_business_info(page_text, url)
-                if ai_data and (ai_data.get('email') or ai_data.get('phone')):
-                    return {"type": "ai", "data": ai_data}
-            # ---------------------------------------------------------
-
-            # FALLBACK: Standard Regex Mode
-            found_candidates = set()
-            found_phone = self._extract_phone(page_text)
-
-            for link in soup.select('a[href^="mailto:"]'):
-                raw = link.get('href').replace('mailto:', '').split('?')[0]
-                cleaned = self._extract_email(raw)
-                if cleaned: found_candidates.add(cleaned)
-
-            text_email = self._extract_email(page_text)
-            if text_email: found_candidates.add(text_email)
-
-            contact_url = self._find_contact_link(soup, url)
-            if contact_url:
-                soup_contact = self._get_page_content(contact_url)
-                if soup_contact:
-                    # Try to find phone on contact page if not found on home
-                    if not found_phone:
-                        found_phone = self._extract_phone(soup_contact.get_text(separator=' '))
-
-                    for link in soup_contact.select('a[href^="mailto:"]'):
-                        raw = link.get('href').replace('mailto:', '').split('?')[0]
-                        cleaned = self._extract_email(raw)
-                        if cleaned: found_candidates.add(cleaned)
-
-                    page_text_sub = soup_contact.get_text(separator=' ')
-                    text_email_sub = self._extract_email(page_text_sub)
-                    if text_email_sub: found_candidates.add(text_email_sub)
-
-            best_email = self._get_best_email(found_candidates, domain)
-
-            if best_email:
-                return {
-                    "type": "regex", 
-                    "data": {
-                        "email": best_email,
-                        "phone": found_phone
-                    }
-                }
+            if junk_filter.is_junk_url(url): return None
+
+            # Seen this site recently? Skip the network entirely.
+            cache_ns = page_cache.namespace('ddg')
+            cached = await fetch_engine.run_blocking(page_cache.get, cache_ns, url)
+            if cached and cached['fresh']:
+                return cached['result']
+
+            # Regex mode: stop downloading once an on-site email and a phone have streamed in
+            stop_when = None
+            if not ai_service.is_configured():
+                stop_when = ContactSignalDetector(domain, junk_domains=junk_filter.domains)
+            content = await self._get_page_content(url, stop_when)
+            if not content: return None
+
+            # Stale entry but the homepage hasn't changed: reuse it instead of re-scraping
+            digest = page_cache.digest(content)
+            if cached and cached['html_digest'] == digest:
+                result = cached['result']
+            else:
+                result = await self._analyze_site(content, url, domain)
+
+            await fetch_engine.run_blocking(page_cache.set, cache_ns, url, result, digest)
+            return result
 
         except Exception:
             return None
+
+    async def _analyze_site(self, content, url, domain):
+        """Extracts contact data from the homepage (plus its contact/about pages in regex mode)."""
+        home = await fetch_engine.run_cpu(self._scan_page, content, url)
+
+        # ---------------------------------------------------------
+        # AI MODE: Gemini Integration
+        # ---------------------------------------------------------
+        if ai_service.is_configured():
+            ai_data = await ai_service.aextract(home['text'], url)
+            if ai_data and (ai_data.get('email') or ai_data.get('phone')):
+                return {"type": "ai", "data": ai_data}
+        # ---------------------------------------------------------
+
+        # FALLBACK: Standard Regex Mode
+        found_candidates = set(home['emails'])
+        found_phone = home['phone']
+
+        # Homepage already has an on-site email and a phone: nothing to gain from its other pages
+        site = site_domain(url)
+        has_site_email = any(is_site_email(email, site) for email in found_candidates)
+
+        if not (has_site_email and found_phone):
+            crawl = await site_crawler.crawl(url, home['links'], need_phone=not found_phone)
+            found_candidates.update(crawl['emails'])
+            # Try to find phone on the contact pages if not found on home
+            if not found_phone and crawl['phones']:
+                found_phone = crawl['phones'][0]
+
+        best_email = self._get_best_email(found_candidates, domain)
+
+        if best_email:
+            return {
+                "type": "regex", 
+                "data": {
+                    "email": best_email,
+                    "phone": found_phone
+                }
+            }
+
         return None
 
+    def _discover(self, q, backend):
+        """Runs one DDG text query (rate limited). Returns the raw results."""
+        try:
+            return ddg_text(
+                q,
+                region='wt-wt',
+                safesearch='off',
+                timelimit=None,
+                backend=backend,
+                max_results=None
+            )
+        except Exception:
+            return []
+
+    def _build_lead(self, site, result, location):
+        data = result['data']
+
+        if result['type'] == 'ai':
+            name = data.get('business_name') or site['title']
+            phone = data.get('phone')
+            address = data.get('location') or location
+            industry = data.get('industry')
+            source_label = f"DuckDuckGo (AI: {industry})" if industry else "DuckDuckGo (AI)"
+        else:
+            name = site['title']
+            phone = data.get('phone') # Get phone from regex
+            address = location
+            source_label = "DuckDuckGo (Deep)"
+
+        # We NO LONGER merge Phone into Location
+        # loc_string = f"{address} | Ph: {phone}" (DELETED)
+
+        return {
+            "Name": name,
+            "Email": data.get('email'),
+            "Phone": phone, # <--- SEPARATE FIELD
+            "Website": site['link'],
+            "Location": address,
+            "Source": source_label
+        }
+
     def search(self, query, location, api_key=None, cx=None, page=1):
         print(f"--- [DuckDuckGo] Ultimate Search Initiated ---")
 
         leads = []
         found_emails = set()
         seen_urls = set()
-        raw_results = []
 
         base_query = f"{query} {location}"
 
@@ -189,95 +230,99 @@ class DuckDuckGoScraper(BaseScraper):
 
         backends = ['api', 'html']
 
-        for q in permutations:
-            print(f"   >>> Searching: {q}")
-            for backend in backends:
+        # A resumed run gets its frontier back: finished sites keep their lead,
+        # the rest are fetched again, and discovery is skipped if it had finished
+        checkpoint = self.checkpoint
+        resumed = checkpoint.load() if checkpoint else None
+        visits = {}
+        pending = set()
+        completed_count = 0
+
+        if resumed:
+            for site in resumed['sites']:
+                seen_urls.add(site_key(site['link']))
+                if site['status'] != 'done':
+                    visit = fetch_engine.submit(self._visit_website, site['link'])
+                    visits[visit] = {"link": site['link'], "title": site['title'] or 'Unknown'}
+                    pending.add(visit)
+                    continue
+                completed_count += 1
+                lead = site['lead']
+                if lead and lead.get('Email') and lead['Email'] not in found_emails:
+                    found_emails.add(lead['Email'])
+                    leads.append(lead)
+
+        # Every permutation x backend runs at once (paced by ddg_rate_limiter), and each
+        # new URL goes straight to the fetch engine, so deep scraping overlaps discovery.
+        tasks = [] if resumed and resumed['discovery_done'] else [(q, backend) for q in permutations for backend in backends]
+        discovery_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(tasks), 1), thread_name_prefix='ddg-discovery'
+        )
+        discovery = {discovery_pool.submit(self._discover, q, backend): (q, backend) for q, backend in tasks}
+        pending.update(discovery)
+
+        if tasks:
+            print(f"   >>> Searching {len(permutations)} queries x {len(backends)} backends...")
+
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                if future in discovery:
+                    q, backend = discovery.pop(future)
+                    results = future.result()
+                    print(f"   >>> [{backend}] {q}: {len(results)} results")
+
+                    new_sites = []
+                    for res in results:
+                        # One deep scrape per site: http/https, www, tracking params and
+                        # other pages of the same domain all collapse to one key
+                        link = clean_url(res.get('href', 'N/A'))
+                        key = site_key(link)
+                        if key and key not in seen_urls and self.claim_site(link):
+                            seen_urls.add(key)
+                            site = {"link": link, "title": res.get('title', 'Unknown')}
+                            new_sites.append(site)
+                            visit = fetch_engine.submit(self._visit_website, link)
+                            visits[visit] = site
+                            pending.add(visit)
+
+                    if checkpoint:
+                        checkpoint.add_sites(new_sites)
+                    if not discovery:
+                        if checkpoint:
+                            checkpoint.mark_discovered()
+                        print(f"   --> Total Unique Websites Found: {len(seen_urls)}")
+                    continue
+
+                site = visits.pop(future)
+                completed_count += 1
+                self.emit_progress(completed_count, len(seen_urls))
+
+                if completed_count % 5 == 0:
+                    print(f"      [{completed_count}/{len(seen_urls)}] Scanned {site['link'][:40]}...")
+
                 try:
-                    with DDGS() as ddgs:
-                        results = list(ddgs.text(
-                            q, 
-                            region='wt-wt', 
-                            safesearch='off', 
-                            timelimit=None, 
-                            backend=backend,
-                            max_results=None
-                        ))
-
-                    if results:
-                        for res in results:
-                            link = res.get('href', 'N/A')
-                            if link != 'N/A' and link not in seen_urls:
-                                seen_urls.add(link)
-                                raw_results.append(res)
-                    time.sleep(1)
+                    result = future.result()
                 except Exception:
-                    pass
-
-        print(f"   --> Total Unique Websites Found: {len(raw_results)}")
+                    result = None
 
-        sites_to_visit = []
-        for res in raw_results:
-            title = res.get('title', 'Unknown')
-            link = res.get('href', 'N/A')
-            sites_to_visit.append({"link": link, "title": title})
+                lead = None
+                if result:
+                    lead = self._build_lead(site, result, location)
+                    email = lead['Email']
 
-        if sites_to_visit:
-            total_sites = len(sites_to_visit)
+                    if email and email not in found_emails:
+                        found_emails.add(email)
+                        leads.append(lead)
+                        self.emit_lead(lead)
+                    else:
+                        lead = None
 
-            # --- IMPORTANT: THROTTLING FOR FREE AI ---
-            # Gemini Free Tier allows 15 requests per minute.
-            # We set max_workers=4 so we don't hit the rate limit instantly.
-            workers = 4 if os.environ.get('GEMINI_API_KEY') else 20
-
-            print(f"   --> Deep Scraping {total_sites} sites (Workers: {workers})...")
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-                future_to_site = {
-                    executor.submit(self._visit_website, site['link']): site 
-                    for site in sites_to_visit
-                }
+                if checkpoint:
+                    checkpoint.site_done(site['link'], lead)
 
-                completed_count = 0
-                for future in concurrent.futures.as_completed(future_to_site):
-                    site = future_to_site[future]
-                    completed_count += 1
-
-                    if completed_count % 5 == 0:
-                        print(f"      [{completed_count}/{total_sites}] Scanned {site['link'][:40]}...")
-
-                    try:
-                        result = future.result()
-                        if result:
-                            data = result['data']
-                            email = data.get('email')
-
-                            if result['type'] == 'ai':
-                                name = data.get('business_name') or site['title']
-                                phone = data.get('phone')
-                                address = data.get('location') or location
-                                industry = data.get('industry')
-                                source_label = f"DuckDuckGo (AI: {industry})" if industry else "DuckDuckGo (AI)"
-                            else:
-                                name = site['title']
-                                phone = data.get('phone') # Get phone from regex
-                                address = location
-                                source_label = "DuckDuckGo (Deep)"
-
-                            # We NO LONGER merge Phone into Location
-                            # loc_string = f"{address} | Ph: {phone}" (DELETED)
-
-                            if email and email not in found_emails:
-                                found_emails.add(email)
-                                leads.append({
-                                    "Name": name,
-                                    "Email": email,
-                                    "Phone": phone, # <--- SEPARATE FIELD
-                                    "Website": site['link'],
-                                    "Location": address,
-                                    "Source": source_label
-                                })
-                    except Exception:
-                        pass
+        discovery_pool.shutdown(wait=False)
 
         print(f"   --> Finished! Total Extracted: {len(leads)} leads.")
-        return leads
\ No newline at end of file
+        return leads
@@ -0,0 +1,352 @@
+# scrapers/fetcher.py
+import os
+import time
+import asyncio
+import threading
+import contextlib
+import multiprocessing
+import concurrent.futures
+from urllib.parse import urlparse
+from curl_cffi.requests import AsyncSession
+from .politeness import PolitenessScheduler, BACKOFF_STATUSES
+from .proxies import proxy_pool, is_proxy_error
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+
+# Content types worth reading when a caller only wants pages (no PDFs, images, downloads)
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+
+def is_html_content_type(content_type):
+    # A missing header is common on small sites, so give those the benefit of the doubt
+    if not content_type:
+        return True
+    return content_type.split(';', 1)[0].strip().lower() in HTML_CONTENT_TYPES
+
+
+def _parse_processes():
+    value = os.environ.get('FETCH_PARSE_PROCESSES', '0').strip().lower()
+    if value == 'auto':
+        return os.cpu_count() or 1
+    return max(int(value or 0), 0)
+
+
+def _parse_worker_init(parent_pid):
+    # Nothing tells pool processes when an RQ work-horse exits with os._exit();
+    # they notice the parent is gone and follow it
+    def _watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+    threading.Thread(target=_watch, name='parse-worker-watch', daemon=True).start()
+
+
+def _noop():
+    return None
+
+
+class FetchResult:
+    """
+    The parts of a response the scrapers use, detached from the session.
+    `content` is None when the body was skipped (non-HTML content type);
+    `truncated` is True when reading stopped at the byte cap or at stop_when.
+    """
+    __slots__ = ('url', 'status_code', 'headers', 'content', 'truncated')
+
+    def __init__(self, url, status_code, headers, content, truncated=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.truncated = truncated
+
+
+class FetchEngine:
+    """
+    One asyncio event loop (on a background thread) and one curl_cffi AsyncSession
+    shared by every scraper in the process. Connections, TLS sessions and DNS
+    lookups are reused, a global semaphore caps requests in flight and a
+    per-host semaphore keeps us from hammering a single site.
+
+    Scrapers write their per-site logic as coroutines and hand blocking work
+    (Gemini calls, cache I/O) to run_blocking() so the loop never stalls.
+    HTML parsing goes to run_cpu(): on the same worker threads by default, or
+    with FETCH_PARSE_PROCESSES set, on a pool of processes so parsing uses
+    every core instead of queueing on the GIL.
+    """
+
+    def __init__(self):
+        self.max_concurrency = int(os.environ.get('FETCH_MAX_CONCURRENCY', 200))
+        self.per_host_limit = int(os.environ.get('FETCH_PER_HOST_LIMIT', 4))
+        self.timeout = int(os.environ.get('FETCH_TIMEOUT', 10))
+        self.blocking_workers = int(os.environ.get('FETCH_BLOCKING_WORKERS', 20))
+        self.parse_processes = _parse_processes()
+        self.max_bytes = int(os.environ.get('FETCH_MAX_BYTES', 1024 * 1024))
+        self.impersonate = "chrome110"
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._session = None
+        self._executor = None
+        self._process_pool = None
+        self._global_limit = None
+        self._host_limits = {}
+        self._politeness = None
+
+    # ---------------------------------------------------------
+    # Event loop lifecycle
+    # ---------------------------------------------------------
+    def _ensure_started(self):
+        with self._lock:
+            # RQ forks a work-horse per job; a loop thread from the parent doesn't survive that
+            if self._loop is not None and self._pid == os.getpid():
+                return self._loop
+
+            self._pid = os.getpid()
+            self._session = None
+            self._host_limits = {}
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+            self._politeness = PolitenessScheduler(self)
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.blocking_workers, thread_name_prefix='fetch-worker'
+            )
+            self._process_pool = self._start_process_pool()
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name='fetch-engine', daemon=True).start()
+            return self._loop
+
+    def _start_process_pool(self):
+        """
+        Starts the parse processes with spawn. Forking isn't safe here: the
+        engine starts on whichever thread fetches first, while search threads,
+        gunicorn or RQ may hold a lock that the child would wait on forever.
+        Spawned children import the parse functions' modules themselves, and
+        stay our own children, so their CPU time shows up in RUSAGE_CHILDREN.
+        Returns None in thread mode.
+        """
+        if not self.parse_processes:
+            return None
+        try:
+            pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.parse_processes, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_parse_worker_init, initargs=(os.getpid(),)
+            )
+            # Pay for the first import now rather than on the first page
+            pool.submit(_noop).result()
+            print(f"   [fetch] Parsing on {self.parse_processes} processes")
+            return pool
+        except Exception as e:
+            print(f"   [fetch] Could not start parse processes, parsing on threads: {e}")
+            return None
+
+    def _get_session(self):
+        # Only called from the loop thread
+        if self._session is None:
+            self._session = AsyncSession(
+                max_clients=self.max_concurrency,
+                impersonate=self.impersonate,
+                headers=DEFAULT_HEADERS
+            )
+        return self._session
+
+    @contextlib.asynccontextmanager
+    async def _host_limit(self, host):
+        # Only touched from the loop thread. The entry ([semaphore, users]) goes
+        # away when nobody holds or waits on it, so a long crawl over thousands
+        # of hosts doesn't keep a semaphore for every one of them
+        entry = self._host_limits.get(host)
+        if entry is None:
+            entry = self._host_limits[host] = [asyncio.Semaphore(self.per_host_limit), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1] and self._host_limits.get(host) is entry:
+                del self._host_limits[host]
+
+    # ---------------------------------------------------------
+    # Coroutine API (for code already running on the engine loop)
+    # ---------------------------------------------------------
+    async def fetch(self, url, params=None, timeout=None, headers=None,
+                    max_bytes=None, html_only=True, stop_when=None, retries=0, polite=True):
+        """
+        GETs a URL and returns a FetchResult. Network errors are raised.
+
+        The body is streamed, and reading stops (the connection is dropped) as soon as:
+        - the headers say it isn't a page (html_only; content is None then),
+        - max_bytes have been read (default FETCH_MAX_BYTES),
+        - stop_when(chunk) returns True, i.e. the caller has seen what it needs.
+
+        Requests are paced per host by the politeness scheduler (polite=False skips
+        it, e.g. for robots.txt). A 403/429/503 puts the host in backoff; with
+        retries > 0 the request is sent again once the backoff is over.
+
+        When the proxy pool has proxies, each attempt goes out through one of
+        them. Only failures of the proxy itself (unreachable, connect timeout,
+        407) count against it, and those are retried straight away through
+        another proxy. Errors and blocks from the site are handled as they are
+        without a proxy; a retry after a block also goes out through another proxy.
+        """
+        parts = urlparse(url)
+        host = parts.netloc.lower()
+        loop = asyncio.get_running_loop()
+        proxy = None
+
+        for attempt in range(retries + 1):
+            proxy = proxy_pool.select(exclude=proxy)
+            if polite:
+                await self._politeness.wait_turn(host, parts.scheme or 'https')
+
+            # Only take a connection slot once it's this host's turn, so hosts in
+            # backoff or crawl-delay don't starve everyone else
+            try:
+                async with self._host_limit(host), self._global_limit:
+                    started = loop.time()
+                    result = await self._fetch_once(
+                        url, params, timeout, headers, max_bytes, html_only, stop_when, proxy
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if proxy is None or not is_proxy_error(e):
+                    raise
+                proxy_pool.report(proxy, False)
+                if attempt == retries:
+                    raise
+                continue
+
+            if proxy is not None:
+                if result.status_code == 407:
+                    # The proxy turned down our credentials; the site never saw the request
+                    proxy_pool.report(proxy, False)
+                    if attempt == retries:
+                        return result
+                    continue
+                proxy_pool.report(proxy, True, loop.time() - started)
+            if polite:
+                self._politeness.record(host, result.status_code, result.headers)
+
+            blocked = result.status_code in BACKOFF_STATUSES
+
+            if not blocked or attempt == retries:
+                return result
+        return result
+
+    async def _fetch_once(self, url, params, timeout, headers, max_bytes, html_only, stop_when, proxy=None):
+        max_bytes = max_bytes or self.max_bytes
+        response = await self._get_session().get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=timeout or self.timeout,
+            proxy=proxy.url if proxy else None,
+            stream=True
+        )
+        chunks = []
+        truncated = False
+        finished = False
+        try:
+            if html_only and not is_html_content_type(response.headers.get('content-type')):
+                return FetchResult(str(response.url), response.status_code, response.headers, None)
+
+            size = 0
+            async for chunk in response.aiter_content():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= max_bytes or (stop_when and stop_when(chunk)):
+                    truncated = True
+                    break
+            finished = not truncated
+        finally:
+            # Stopped early, failed or cancelled (e.g. by a crawl budget): drop the connection
+            if not finished:
+                self._abort_stream(response)
+            await response.aclose()
+
+        content = b''.join(chunks)
+        if len(content) > max_bytes:
+            content = content[:max_bytes]
+        return FetchResult(str(response.url), response.status_code, response.headers, content, truncated)
+
+    @staticmethod
+    def _abort_stream(response):
+        # aclose() alone waits for curl to finish the transfer; setting quit_now
+        # makes curl's write callback fail so the connection is dropped right away
+        quit_now = getattr(response, 'quit_now', None)
+        if quit_now is not None:
+            quit_now.set()
+
+    async def run_blocking(self, fn, *args):
+        """Runs CPU-bound or blocking work on the worker threads."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def run_cpu(self, fn, *args):
+        """
+        Runs a CPU-bound parse, on the process pool when there is one.
+        fn must be a module-level function or staticmethod, and its arguments and
+        result picklable: raw page bytes in, a small dict back.
+        """
+        pool = self._process_pool
+        if pool is None:
+            return await self.run_blocking(fn, *args)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except concurrent.futures.process.BrokenProcessPool as e:
+            # A worker died (OOM, segfault in a parser): parse on threads from here on
+            print(f"   [fetch] Parse process pool broke ({e}), falling back to threads")
+            if self._process_pool is pool:
+                self._process_pool = None
+            return await self.run_blocking(fn, *args)
+
+    # ---------------------------------------------------------
+    # Sync API (for the scrapers' search() methods)
+    # ---------------------------------------------------------
+    def submit(self, coro_fn, *args):
+        """Schedules coro_fn(*args) on the engine loop. Returns a concurrent.futures.Future."""
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro_fn(*args), loop)
+
+    def run(self, coro_fn, *args):
+        """Runs coro_fn(*args) on the engine loop and waits for the result."""
+        return self.submit(coro_fn, *args).result()
+
+    def get(self, url, **kwargs):
+        """Blocking fetch, for one-off requests outside a coroutine."""
+        return self.run(lambda: self.fetch(url, **kwargs))
+
+    def map_as_completed(self, coro_fn, items, limit=None):
+        """
+        Runs coro_fn(item) for every item concurrently (at most `limit` at once)
+        and yields (item, result) as each one finishes. Failed items yield None.
+        """
+        semaphore = asyncio.Semaphore(limit or self.max_concurrency)
+
+        async def _limited(item):
+            async with semaphore:
+                return await coro_fn(item)
+
+        future_to_item = {self.submit(_limited, item): item for item in items}
+
+        for future in concurrent.futures.as_completed(future_to_item):
+            try:
+                result = future.result()
+            except Exception:
+                result = None
+            yield future_to_item[future], result
+
+    def map(self, coro_fn, items, limit=None):
+        """Like map_as_completed(), but returns the results in input order."""
+        items = list(items)
+        results = {}
+        for index, result in self.map_as_completed(lambda i: coro_fn(items[i]), range(len(items)), limit):
+            results[index] = result
+        return [results[i] for i in range(len(items))]
+
+
+fetch_engine = FetchEngine()
@@ -0,0 +1,145 @@
+# scrapers/filters.py
+import os
+import re
+import json
+from urllib.parse import urlparse
+from .contacts import NOT_EMAIL_SUFFIXES
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'junk_filters.json')
+
+_END = ''  # trie key marking a complete entry (labels are never empty)
+
+
+class DomainSuffixTrie:
+    """
+    Set of domains matched by suffix, stored as a trie of labels read from the
+    right: 'google.com' matches 'google.com' and 'maps.google.com' but not
+    'notgoogle.com'; 'gov' matches every '.gov' host. Lookups cost one dict hop
+    per label of the host, however many entries there are.
+
+    Supports `host in trie`, so it can be passed anywhere a set of junk domains is expected.
+    """
+
+    def __init__(self, domains=()):
+        self._root = {}
+        self._size = 0
+        for domain in domains:
+            self.add(domain)
+
+    @staticmethod
+    def _labels(domain):
+        return [label for label in domain.strip().lower().strip('.').split('.') if label]
+
+    def add(self, domain):
+        labels = self._labels(domain)
+        if not labels:
+            return
+        node = self._root
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+        if _END not in node:
+            node[_END] = True
+            self._size += 1
+
+    def __contains__(self, host):
+        if not host:
+            return False
+        node = self._root
+        for label in reversed(host.lower().rstrip('.').split('.')):
+            node = node.get(label)
+            if node is None:
+                return False
+            if _END in node:
+                return True
+        return False
+
+    def __len__(self):
+        return self._size
+
+
+def _substring_pattern(words):
+    """
+    One regex matching any of `words` anywhere in a string. The words are merged
+    into a character trie first so shared prefixes are only tried once, instead
+    of the engine testing every alternative at every position.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[_END] = True
+
+    def render(node):
+        # A shorter word already matches, so longer words through this node don't matter
+        if _END in node:
+            return ''
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    return render(trie)
+
+
+class JunkFilter:
+    """
+    Shared junk classifier for the scrapers: sites not worth deep-scraping
+    (directories, social networks, big platforms) and contact addresses not
+    worth keeping (abuse@, noreply@, image filenames, platform domains).
+
+    Lists come from junk_filters.json next to this file, plus any extra
+    files in JUNK_FILTERS_PATH (os.pathsep-separated), merged together.
+    """
+
+    def __init__(self, domains=(), email_local_parts=()):
+        self.domains = DomainSuffixTrie(domains)
+        self._local_parts = set()
+        self._local_re = None
+        self.add_email_local_parts(email_local_parts)
+
+    @classmethod
+    def from_config(cls, *paths):
+        junk_filter = cls()
+        for path in paths:
+            try:
+                with open(path) as f:
+                    config = json.load(f)
+            except Exception as e:
+                print(f"Could not load junk filter config {path}: {e}")
+                continue
+            for domain in config.get('domains', []):
+                junk_filter.domains.add(domain)
+            junk_filter.add_email_local_parts(config.get('email_local_parts', []))
+        return junk_filter
+
+    def add_email_local_parts(self, words):
+        words = {w.strip().lower() for w in words if w and w.strip()}
+        if words - self._local_parts:
+            self._local_parts |= words
+            self._local_re = re.compile(_substring_pattern(self._local_parts))
+
+    def is_junk_host(self, host):
+        return host in self.domains
+
+    def is_junk_url(self, url):
+        try:
+            return urlparse(url).hostname in self.domains
+        except Exception:
+            return False
+
+    def is_junk_email(self, email):
+        """Generic mailbox (abuse@, noreply@...), junk domain, or an asset filename caught by the regex."""
+        email = email.strip().lower()
+        if email.endswith(NOT_EMAIL_SUFFIXES):
+            return True
+        local, _, domain = email.rpartition('@')
+        if domain in self.domains:
+            return True
+        return bool(self._local_re and self._local_re.search(local))
+
+
+def _config_paths():
+    extra = os.environ.get('JUNK_FILTERS_PATH', '')
+    return [DEFAULT_CONFIG_PATH] + [p for p in extra.split(os.pathsep) if p]
+
+
+junk_filter = JunkFilter.from_config(*_config_paths())
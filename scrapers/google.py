@@ -1,50 +1,63 @@
 # scrapers/google.py
-import time
-import re
-import concurrent.futures
 import os
+import threading
+import concurrent.futures
+import httplib2
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from curl_cffi import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse
 from .base_scraper import BaseScraper
-from ai_extractor import extract_business_info
+from .fetcher import fetch_engine
+from .cache import page_cache
+from .html_extract import extract_page
+from .contacts import first_email, first_phone, ContactSignalDetector
+from .filters import junk_filter
+from .crawler import site_crawler, site_domain, site_key, is_site_email
+from .urls import clean_url
+from ai_extractor import ai_service
+from rate_limiter import TokenBucket
 
-class GoogleScraper(BaseScraper):
-    JUNK_DOMAINS = {
-        'example.com', 'sentry.io', 'wixpress.com', 'google.com',
-        'schema.org', 'wordpress.org', '.gov', 'facebook.com', 
-        'linkedin.com', 'twitter.com', 'instagram.com', 'youtube.com',
-        'amazon.com', 'ebay.com', 'yelp.com', 'yellowpages.com'
-    }
+# CSE returns at most 100 results (10 pages of 10) per query
+CSE_MAX_PAGES = 10
 
-    # Regex for fallback (when AI is off)
-    EMAIL_REGEX = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-z]{2,10}\b"
-    PHONE_REGEX = r"(\+\d{1,2}\s?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}"
+# Shared by every CSE call in the process (Google + social X-ray searches)
+cse_rate_limiter = TokenBucket.per_minute(
+    int(os.environ.get('GOOGLE_CSE_QUERIES_PER_MINUTE', 60)),
+    int(os.environ.get('GOOGLE_CSE_BURST', 5))
+)
 
-    JUNK_EXTENSIONS = ('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.png', '.jpg', '.jpeg', '.gif', '.xml', '.zip', '.css', '.js', '.mp4')
+_cse_services = {}
+_cse_lock = threading.Lock()
+_cse_http = threading.local()
 
-    def _extract_email_regex(self, text):
-        """Fallback Regex extraction."""
-        if not text: return None
-        emails = set(re.findall(self.EMAIL_REGEX, text, re.IGNORECASE))
-        valid_emails = []
-        for email in emails:
-            domain = email.split('@')[-1].lower()
-            if domain not in self.JUNK_DOMAINS and not email.lower().endswith(('.png', '.jpg')):
-                valid_emails.append(email)
-        return valid_emails[0] if valid_emails else None
-
-    def _extract_phone(self, text):
-        """Extracts the first valid looking phone number."""
-        if not text: return None
-        matches = re.findall(r"\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}", text)
-        if matches:
-            return matches[0].strip()
-        return None
 
-    def _visit_website(self, url, title):
+def get_cse_service(api_key):
+    """
+    The discovery document is parsed once per API key and the service reused
+    across searches. The service object itself is shared between threads, so
+    requests go through cse_execute() which gives each thread its own Http.
+    """
+    with _cse_lock:
+        service = _cse_services.get(api_key)
+        if service is None:
+            service = build("customsearch", "v1", developerKey=api_key, cache_discovery=False)
+            _cse_services[api_key] = service
+        return service
+
+
+def cse_execute(request):
+    """Runs a CSE request on this thread's own httplib2.Http (it isn't thread-safe)."""
+    http = getattr(_cse_http, 'http', None)
+    if http is None:
+        http = _cse_http.http = httplib2.Http(timeout=15)
+    cse_rate_limiter.acquire()
+    return request.execute(http=http)
+
+
+class GoogleScraper(BaseScraper):
+    JUNK_EXTENSIONS = ('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.png', '.jpg', '.jpeg', '.gif', '.xml', '.zip', '.css', '.js', '.mp4')
+
+    async def _visit_website(self, url):
         """
         Deep scrapes the website using AI or Regex.
         """
@@ -52,143 +65,244 @@ class GoogleScraper(BaseScraper):
 
         try:
             # Check domain junk filter
-            domain = urlparse(url).netloc.lower().replace('www.', '')
-            if any(junk in domain for junk in self.JUNK_DOMAINS): return None
+            if junk_filter.is_junk_url(url): return None
+
+            # Seen this site recently? Skip the network entirely.
+            cache_ns = page_cache.namespace('google')
+            cached = await fetch_engine.run_blocking(page_cache.get, cache_ns, url)
+            if cached and cached['fresh']:
+                return cached['result']
 
             # print(f"   --> Deep Scraping: {url}")
-            response = requests.get(
-                url, 
-                impersonate="chrome110", 
-                timeout=10,
-                headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
-            )
+            # Regex mode only needs an email and a phone: stop downloading once both have streamed in
+            stop_when = None
+            if not ai_service.is_configured():
+                stop_when = ContactSignalDetector(urlparse(url).hostname, junk_domains=junk_filter.domains)
+            response = await fetch_engine.fetch(url, stop_when=stop_when)
 
-            if response.status_code != 200: return None
-
-            soup = BeautifulSoup(response.content, 'html.parser')
-            page_text = soup.get_text(separator=' ', strip=True)
-
-            # ---------------------------------------------------------
-            # AI MODE
-            # ---------------------------------------------------------
-            if os.environ.get('GEMINI_API_KEY'):
-                ai_data = extract_business_info(page_text, url)
-                if ai_data and (ai_data.get('email') or ai_data.get('phone')):
-                    return {
-                        "type": "ai",
-                        "data": ai_data
-                    }
-
-            # ---------------------------------------------------------
-            # REGEX FALLBACK
-            # ---------------------------------------------------------
-            # 1. Check Body Text
-            email = self._extract_email_regex(page_text)
-            phone = self._extract_phone(page_text)
-
-            # 2. Check Mailto Links
-            if not email:
-                for link in soup.select('a[href^="mailto:"]'):
-                    raw = link.get('href').replace('mailto:', '').split('?')[0]
-                    email = self._extract_email_regex(raw)
-                    if email: break
-
-            if email or phone:
-                return {
-                    "type": "regex", 
-                    "email": email, 
-                    "phone": phone
-                }
+            if response.status_code != 200 or not response.content: return None
+
+            # Stale entry but the page hasn't changed: reuse it instead of re-parsing
+            digest = page_cache.digest(response.content)
+            if cached and cached['html_digest'] == digest:
+                result = cached['result']
+            else:
+                result = await self._analyze_page(response.content, url)
+
+            await fetch_engine.run_blocking(page_cache.set, cache_ns, url, result, digest)
+            return result
 
         except Exception:
             pass
         return None
 
+    async def _analyze_page(self, content, url):
+        """Parses a fetched page on an engine worker thread, then asks Gemini if AI mode is on."""
+        page = await fetch_engine.run_cpu(self._parse_page, content, url)
+
+        # ---------------------------------------------------------
+        # AI MODE
+        # ---------------------------------------------------------
+        if ai_service.is_configured():
+            ai_data = await ai_service.aextract(page['text'], url)
+            if ai_data and (ai_data.get('email') or ai_data.get('phone')):
+                return {
+                    "type": "ai",
+                    "data": ai_data
+                }
+
+        # ---------------------------------------------------------
+        # REGEX FALLBACK
+        # ---------------------------------------------------------
+        email = page['email']
+        phone = page['phone']
+
+        # No on-site email on the homepage: try its best contact/about pages
+        domain = site_domain(url)
+        if not (email and is_site_email(email, domain)):
+            crawl = await site_crawler.crawl(url, page['links'], need_phone=not phone)
+            if crawl['emails'] and (not email or is_site_email(crawl['emails'][0], domain)):
+                email = crawl['emails'][0]
+            if not phone and crawl['phones']:
+                phone = crawl['phones'][0]
+
+        if email or phone:
+            return {
+                "type": "regex", 
+                "email": email, 
+                "phone": phone
+            }
+        return None
+
+    @staticmethod
+    def _parse_page(content, url=None):
+        """Single-pass parse + regex over one page. Runs on a parse worker (thread or process)."""
+        page = extract_page(content, url)
+
+        # 1. Check Body Text
+        email = first_email(page.text, junk_filter.domains)
+        phone = first_phone(page.text)
+
+        # 2. Check Mailto / Tel Links
+        if not email:
+            for raw in page.mailto:
+                email = first_email(raw, junk_filter.domains)
+                if email: break
+        if not phone and page.tel:
+            phone = page.tel[0]
+
+        return {"text": page.text, "email": email, "phone": phone, "links": page.contact_links}
+
+    def _fetch_cse_page(self, service, full_query, cx, page_index):
+        """One CSE results page (0-based). Returns its items; raises HttpError on quota/errors."""
+        result = cse_execute(service.cse().list(
+            q=full_query, cx=cx, num=10, start=(page_index * 10) + 1
+        ))
+        return result.get('items', [])
+
+    def _build_lead(self, site_info, result, location):
+        if result['type'] == 'ai':
+            d = result['data']
+            industry = d.get('industry')
+            return {
+                "Name": d.get('business_name') or site_info['title'],
+                "Email": d.get('email'),
+                "Phone": d.get('phone'),
+                "Website": site_info['link'],
+                "Location": d.get('location') or location,
+                "Source": f"Google (AI: {industry})" if industry else "Google (AI)"
+            }
+        return {
+            "Name": site_info['title'],
+            "Email": result.get('email'),
+            "Phone": result.get('phone'),
+            "Website": site_info['link'],
+            "Location": location,
+            "Source": "Google (Deep)"
+        }
+
     def search(self, query, location, api_key=None, cx=None, page=1):
         print(f"--- [GoogleScraper] Official API Search: {query} in {location} ---")
 
         full_query = f"{query} {location}"
         leads = []
         found_emails = set()
-        sites_to_visit = []
+        seen_urls = set()
 
         try:
-            service = build("customsearch", "v1", developerKey=api_key)
-
-            # Fetch up to 3 pages (30 results) to process
-            for p in range(0, 10): 
-                start_index = (p * 10) + 1
-                print(f"   >>> Fetching Page {p + 1} from Google API...")
-
-                try:
-                    result = service.cse().list(
-                        q=full_query, cx=cx, num=10, start=start_index
-                    ).execute()
-                except HttpError as e:
-                    print(f"Google API Limit/Error: {e}")
-                    break
-
-                if 'items' not in result:
-                    break
-
-                for item in result['items']:
-                    link = item.get('link')
-                    title = item.get('title', 'Unknown')
-                    if link:
-                        sites_to_visit.append({'link': link, 'title': title})
-
-                time.sleep(1) # Be polite to API
-
-            # --- DEEP SCRAPING PHASE ---
-            if sites_to_visit:
-                total = len(sites_to_visit)
-                # Max 5 workers for AI (Free Tier limit), 15 for Regex
-                workers = 5 if os.environ.get('GEMINI_API_KEY') else 15
-
-                print(f"   --> Deep Scraping {total} sites (Workers: {workers})...")
-
-                with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-                    future_to_site = {
-                        executor.submit(self._visit_website, s['link'], s['title']): s 
-                        for s in sites_to_visit
-                    }
-
-                    for future in concurrent.futures.as_completed(future_to_site):
-                        site_info = future_to_site[future]
+            service = get_cse_service(api_key)
+
+            # Producer/consumer: CSE pages are fetched on a small pool (paced by
+            # cse_rate_limiter) and each page's items go to the fetch engine as soon
+            # as it arrives, so deep scraping starts with the first page.
+            # Page 1 goes first; the rest are only requested if it had results.
+            cse_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=int(cse_rate_limiter.capacity), thread_name_prefix='google-cse'
+            )
+            visits = {}
+            pending = set()
+            completed_count = 0
+            stop_paging = False
+
+            # A resumed run gets its frontier back: finished sites keep their lead,
+            # the rest are fetched again, and no API quota is spent if paging had finished
+            checkpoint = self.checkpoint
+            resumed = checkpoint.load() if checkpoint else None
+            if resumed:
+                for site in resumed['sites']:
+                    seen_urls.add(site_key(site['link']))
+                    if site['status'] != 'done':
+                        site_info = {'link': site['link'], 'title': site['title'] or 'Unknown'}
+                        visit = fetch_engine.submit(self._visit_website, site_info['link'])
+                        visits[visit] = site_info
+                        pending.add(visit)
+                        continue
+                    completed_count += 1
+                    lead = site['lead']
+                    if lead and lead.get('Email') and lead['Email'] not in found_emails:
+                        found_emails.add(lead['Email'])
+                        leads.append(lead)
+
+            pages = {}
+            if not (resumed and resumed['discovery_done']):
+                pages[cse_pool.submit(self._fetch_cse_page, service, full_query, cx, 0)] = 0
+                pending.update(pages)
+                print("   >>> Fetching Page 1 from Google API...")
+
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    if future in pages:
+                        page_index = pages.pop(future)
                         try:
-                            result = future.result()
-                            if result:
-                                # Prepare Lead Data
-                                if result['type'] == 'ai':
-                                    d = result['data']
-                                    email = d.get('email')
-                                    name = d.get('business_name') or site_info['title']
-                                    phone = d.get('phone')
-                                    loc = d.get('location') or location
-                                    industry = d.get('industry')
-                                    source = f"Google (AI: {industry})" if industry else "Google (AI)"
-                                else:
-                                    email = result.get('email')
-                                    name = site_info['title']
-                                    phone = result.get('phone')
-                                    loc = location
-                                    source = "Google (Deep)"
-
-                                if email and email not in found_emails:
-                                    found_emails.add(email)
-                                    leads.append({
-                                        "Name": name,
-                                        "Email": email,
-                                        "Phone": phone, # <--- SEPARATE FIELD
-                                        "Website": site_info['link'],
-                                        "Location": loc,
-                                        "Source": source
-                                    })
-                        except Exception:
-                            pass
+                            items = [] if future.cancelled() else future.result()
+                        except HttpError as e:
+                            print(f"Google API Limit/Error: {e}")
+                            items = []
+                            stop_paging = True
+
+                        if not items or stop_paging:
+                            # Out of results (or quota): don't start any more pages
+                            stop_paging = True
+                            for other in pages:
+                                other.cancel()
+                        elif page_index == 0:
+                            print(f"   >>> Fetching Pages 2-{CSE_MAX_PAGES} from Google API...")
+                            for p in range(1, CSE_MAX_PAGES):
+                                page_future = cse_pool.submit(self._fetch_cse_page, service, full_query, cx, p)
+                                pages[page_future] = p
+                                pending.add(page_future)
+
+                        new_sites = []
+                        for item in items:
+                            # One deep scrape per site: http/https, www, tracking params and
+                            # other pages of the same domain all collapse to one key
+                            link = clean_url(item.get('link'))
+                            key = site_key(link)
+                            if key and key not in seen_urls and self.claim_site(link):
+                                seen_urls.add(key)
+                                site_info = {'link': link, 'title': item.get('title', 'Unknown')}
+                                new_sites.append(site_info)
+                                visit = fetch_engine.submit(self._visit_website, link)
+                                visits[visit] = site_info
+                                pending.add(visit)
+
+                        if checkpoint:
+                            checkpoint.add_sites(new_sites)
+                        if not pages:
+                            if checkpoint:
+                                checkpoint.mark_discovered()
+                            print(f"   --> Deep Scraping {len(seen_urls)} sites...")
+                        continue
+
+                    site_info = visits.pop(future)
+                    completed_count += 1
+                    self.emit_progress(completed_count, len(seen_urls))
+
+                    try:
+                        result = future.result()
+                    except Exception:
+                        result = None
+
+                    lead = None
+                    if result:
+                        lead = self._build_lead(site_info, result, location)
+                        email = lead['Email']
+
+                        if email and email not in found_emails:
+                            found_emails.add(email)
+                            leads.append(lead)
+                            self.emit_lead(lead)
+                        else:
+                            lead = None
+
+                    if checkpoint:
+                        checkpoint.site_done(site_info['link'], lead)
 
+            cse_pool.shutdown(wait=False)
             return leads
 
         except Exception as e:
             print(f"Google Scraper Critical Error: {e}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
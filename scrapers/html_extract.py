@@ -0,0 +1,230 @@
+# scrapers/html_extract.py
+import re
+import codecs
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml is optional
+    etree = None
+
+# <meta charset="x"> or <meta http-equiv="Content-Type" content="text/html; charset=x">
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.I)
+_BOMS = ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+# bs4 parser name for the few places that still need CSS selectors (YP result cards)
+SOUP_PARSER = 'lxml' if etree is not None else 'html.parser'
+
+CONTACT_KEYWORDS = ('contact', 'about', 'team', 'connect', 'support', 'staff')
+CF_EMAIL_PATH = '/cdn-cgi/l/email-protection'
+
+# Text inside these is never visible (same as BeautifulSoup's get_text)
+_SKIP_TAGS = {'script', 'style', 'template'}
+
+
+def decode_cf_email(encoded):
+    """Decodes a Cloudflare-obfuscated email ('/cdn-cgi/l/email-protection#<hex>' or data-cfemail)."""
+    try:
+        if '#' in encoded:
+            encoded = encoded.split('#', 1)[1]
+        # The first 2 hex chars are the XOR key
+        key = int(encoded[:2], 16)
+        return ''.join(chr(int(encoded[i:i + 2], 16) ^ key) for i in range(2, len(encoded), 2))
+    except Exception:
+        return None
+
+
+class PageData:
+    """Everything the scrapers read from one HTML page."""
+    __slots__ = ('text', 'mailto', 'tel', 'cf_emails', 'contact_links')
+
+    def __init__(self, text, mailto, tel, cf_emails, contact_links):
+        self.text = text                    # visible text, like get_text(separator=' ', strip=True)
+        self.mailto = mailto                # addresses from mailto: links, in page order
+        self.tel = tel                      # numbers from tel: links
+        self.cf_emails = cf_emails          # decoded Cloudflare-protected addresses
+        self.contact_links = contact_links  # same-site (url, anchor text, in_footer) for contact/about/team links
+
+
+class _Collector:
+    """
+    Parser target shared by both backends: gets start/end/data events and
+    builds a PageData without ever materializing a tree.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.base_host = urlparse(base_url).netloc if base_url else None
+        self.text = []
+        self.mailto = []
+        self.tel = []
+        self.cf_emails = []
+        self.contact_links = []
+        self._buffer = []
+        self._skip_depth = 0
+        self._footer_depth = 0
+        self._seen_links = set()
+        self._anchor_href = None
+        self._anchor_text = []
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        chunk = ''.join(self._buffer).strip()
+        self._buffer = []
+        if chunk:
+            self.text.append(chunk)
+            if self._anchor_href is not None:
+                self._anchor_text.append(chunk)
+
+    def start(self, tag, attrs):
+        self._flush()
+        tag = tag.lower()
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag == 'footer':
+            self._footer_depth += 1
+
+        cf_data = attrs.get('data-cfemail')
+        if cf_data:
+            self._add_cf_email(cf_data)
+
+        if tag == 'a':
+            href = (attrs.get('href') or '').strip()
+            self._anchor_href = href or None
+            self._anchor_text = []
+
+    def end(self, tag):
+        self._flush()
+        tag = tag.lower()
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == 'footer':
+            self._footer_depth = max(0, self._footer_depth - 1)
+        elif tag == 'a' and self._anchor_href is not None:
+            self._close_anchor(self._anchor_href, ' '.join(self._anchor_text))
+            self._anchor_href = None
+
+    def data(self, data):
+        if not self._skip_depth:
+            self._buffer.append(data)
+
+    def _add_cf_email(self, encoded):
+        decoded = decode_cf_email(encoded)
+        if decoded and decoded not in self.cf_emails:
+            self.cf_emails.append(decoded)
+
+    def _close_anchor(self, href, text):
+        lowered = href.lower()
+        if lowered.startswith('mailto:'):
+            email = href[7:].split('?')[0].strip()
+            if email:
+                self.mailto.append(email)
+            return
+        if lowered.startswith('tel:'):
+            number = href[4:].strip()
+            if number:
+                self.tel.append(number)
+            return
+        if CF_EMAIL_PATH in lowered:
+            self._add_cf_email(href)
+            return
+        if lowered.startswith(('javascript:', '#')) or not self.base_url:
+            return
+
+        if any(k in text.lower() or k in lowered for k in CONTACT_KEYWORDS):
+            full_url = urljoin(self.base_url, href).split('#')[0]
+            if urlparse(full_url).netloc == self.base_host and full_url not in self._seen_links:
+                self._seen_links.add(full_url)
+                self.contact_links.append((full_url, text, self._footer_depth > 0))
+
+    def close(self):
+        self._flush()
+        if self._anchor_href is not None:
+            self._close_anchor(self._anchor_href, ' '.join(self._anchor_text))
+            self._anchor_href = None
+        return PageData(' '.join(self.text), self.mailto, self.tel, self.cf_emails, self.contact_links)
+
+
+class _StdlibDriver(HTMLParser):
+    """Feeds html.parser events into a _Collector (used when lxml isn't installed)."""
+
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, {k: v or '' for k, v in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def detect_encoding(content):
+    """
+    Charset of raw page bytes: the BOM or <meta charset> if there is one,
+    else UTF-8 if the bytes decode as UTF-8, else Windows-1252. Without this
+    lxml reads undeclared UTF-8 pages as Latin-1 ('Café' -> 'CafÃ©').
+    """
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding
+    match = _META_CHARSET.search(content[:4096])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode('ascii')).name
+        except (LookupError, UnicodeDecodeError):
+            pass
+    try:
+        content.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A body cut off at the byte cap can end mid-character
+        if e.start < len(content) - 3:
+            return 'windows-1252'
+    return 'utf-8'
+
+
+def _to_text(content, encoding='utf-8'):
+    if isinstance(content, bytes):
+        return content.decode(encoding, errors='replace')
+    return content or ''
+
+
+def extract_page(content, base_url=None):
+    """
+    Parses a page once and returns a PageData with its visible text, mailto/tel
+    links, Cloudflare-protected emails and same-site contact links.
+    Uses lxml's event parser when available, html.parser otherwise.
+    Contact links are only collected when base_url is given.
+    """
+    collector = _Collector(base_url)
+    if isinstance(content, str):
+        content, encoding = content.encode('utf-8'), 'utf-8'
+    else:
+        encoding = detect_encoding(content) if content else 'utf-8'
+
+    if etree is not None and content:
+        try:
+            parser = etree.HTMLParser(target=collector, recover=True, encoding=encoding)
+            parser.feed(content)
+            return parser.close()
+        except Exception:
+            # lxml gave up on this page: start over with the forgiving stdlib parser
+            collector = _Collector(base_url)
+
+    driver = _StdlibDriver(collector)
+    try:
+        driver.feed(_to_text(content, encoding))
+        driver.close()
+    except Exception:
+        pass
+    return collector.close()
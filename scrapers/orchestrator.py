@@ -0,0 +1,217 @@
+# scrapers/orchestrator.py
+import queue
+import threading
+import concurrent.futures
+from .base_scraper import BaseScraper
+from .google import GoogleScraper
+from .social import SocialMediaScraper
+from .yellow_pages import YellowPagesScraper
+from .duckduckgo import DuckDuckGoScraper
+from .crawler import site_key
+
+SOURCES = ('google', 'ddg', 'yellowpages', 'linkedin', 'facebook', 'instagram')
+
+
+class SiteRegistry:
+    """Which source owns each website in one multi-source search (thread-safe)."""
+
+    def __init__(self):
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def claim(self, url, owner):
+        key = site_key(url)
+        if key is None:
+            return True
+        with self._lock:
+            current = self._owners.setdefault(key, owner)
+        return current is owner
+
+
+class LeadMerger:
+    """
+    Folds leads from several sources into one set. Leads for the same website
+    (or, without one, the same email) become one lead: blanks are filled in
+    from the others and the sources are listed together.
+    """
+
+    FIELDS = ('Name', 'Email', 'Phone', 'Website', 'Location', 'Source')
+    MAX_SOURCE_LENGTH = 50  # leads.source is a String(50)
+
+    def __init__(self):
+        self.leads = []
+        self._index = {}
+        self._sources = {}
+
+    @staticmethod
+    def _keys(lead):
+        keys = []
+        website_key = site_key(lead.get('Website'))
+        if website_key:
+            keys.append(('site', website_key))
+        email = (lead.get('Email') or '').strip().lower()
+        if email and email != 'n/a':
+            keys.append(('email', email))
+        phone = ''.join(ch for ch in (lead.get('Phone') or '') if ch.isdigit())
+        if not keys and phone:
+            keys.append(('listing', (lead.get('Name') or '').strip().lower(), phone))
+        return keys
+
+    def add(self, lead):
+        """
+        Returns the merged lead (the dict that ends up in .leads) if the lead is
+        new, None if it was folded into an earlier one.
+        """
+        keys = self._keys(lead)
+        existing = next((self._index[k] for k in keys if k in self._index), None)
+
+        if existing is None:
+            merged = dict(lead)
+            self.leads.append(merged)
+            self._sources[id(merged)] = [lead['Source']] if lead.get('Source') else []
+            is_new = True
+        else:
+            merged = existing
+            for field in self.FIELDS:
+                value = lead.get(field)
+                if field == 'Source':
+                    sources = self._sources[id(merged)]
+                    if value and value not in sources:
+                        sources.append(value)
+                        merged['Source'] = self._join_sources(sources)
+                elif value and value != "N/A" and merged.get(field) in (None, '', "N/A"):
+                    merged[field] = value
+            is_new = False
+
+        for key in keys + self._keys(merged):
+            self._index.setdefault(key, merged)
+        return merged if is_new else None
+
+    @classmethod
+    def _join_sources(cls, sources):
+        # "Google + DuckDuckGo" while it fits the column, else "Google + 3 more"
+        joined = ' + '.join(sources)
+        if len(joined) <= cls.MAX_SOURCE_LENGTH:
+            return joined
+        return f"{sources[0]} + {len(sources) - 1} more"[:cls.MAX_SOURCE_LENGTH]
+
+
+class MultiSourceScraper(BaseScraper):
+    """
+    Runs several scrapers on one query at once and returns one lead set.
+
+    The scrapers already share the fetch engine (one connection pool) and the
+    page cache. A SiteRegistry on top makes sure a website found by more than one
+    source is only deep-scraped by the first one, and a LeadMerger folds
+    the leads together. Leads are emitted as they arrive, but only the first
+    time a business is seen. on_lead/on_progress run on the calling thread,
+    like every other scraper.
+    """
+
+    def __init__(self, sources=None, search_method='api', yp_pages=1):
+        self.sources = [s for s in (sources or SOURCES) if s in SOURCES]
+        self.search_method = search_method
+        self.yp_pages = yp_pages
+
+    def _build(self, source, api_key, cx):
+        """Returns (scraper, call) for one source, or (None, reason) if it can't run."""
+        has_keys = bool(api_key and cx)
+
+        if source == 'google':
+            if not has_keys:
+                return None, "Google API key and CX are required"
+            scraper = GoogleScraper()
+            return scraper, lambda q, loc: scraper.search(q, loc, api_key, cx)
+
+        if source == 'ddg':
+            scraper = DuckDuckGoScraper()
+            return scraper, lambda q, loc: scraper.search(q, loc)
+
+        if source == 'yellowpages':
+            scraper = YellowPagesScraper()
+            if self.yp_pages > 1:
+                return scraper, lambda q, loc: scraper.search_batch(q, loc, max_pages=self.yp_pages)
+            return scraper, lambda q, loc: scraper.search(q, loc)
+
+        # Social X-ray: the official API when keys are there, DDG otherwise
+        backend = 'google' if self.search_method == 'api' and has_keys else 'ddg'
+        scraper = SocialMediaScraper(source, backend=backend)
+        return scraper, lambda q, loc: scraper.search(q, loc, api_key, cx)
+
+    def search(self, query, location, api_key=None, cx=None):
+        print(f"--- [MultiSource] {', '.join(self.sources)}: {query} in {location} ---")
+
+        registry = SiteRegistry()
+        merger = LeadMerger()
+        events = queue.Queue()
+        progress = {}
+        errors = {}
+        runs = {}
+        streamed_leads = []
+
+        for source in self.sources:
+            scraper, call = self._build(source, api_key, cx)
+            if scraper is None:
+                errors[source] = call
+                continue
+
+            # Source threads only queue events; this thread merges and emits them
+            scraper.site_registry = registry
+            scraper.on_lead = lambda lead, source=source: events.put(('lead', source, lead))
+            scraper.on_progress = lambda done, total, source=source: events.put(('progress', source, (done, total)))
+            runs[source] = call
+
+        if not runs:
+            return {"error": "; ".join(f"{s}: {e}" for s, e in errors.items()) or "No sources selected"}
+
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=len(runs), thread_name_prefix='multi-source')
+        futures = {pool.submit(call, query, location): source for source, call in runs.items()}
+        for future in futures:
+            future.add_done_callback(lambda f: events.put(('done', futures[f], None)))
+
+        remaining = len(futures)
+        try:
+            while remaining:
+                kind, source, payload = events.get()
+                if kind == 'lead':
+                    streamed_leads.append(payload)
+                    # Emit the merger's own copy: it's the same object the result returns
+                    merged = merger.add(payload)
+                    if merged is not None:
+                        self.emit_lead(merged)
+                elif kind == 'progress':
+                    progress[source] = payload
+                    self.emit_progress(sum(d for d, _ in progress.values()), sum(t for _, t in progress.values()))
+                else:
+                    remaining -= 1
+        finally:
+            pool.shutdown(wait=False)
+
+        streamed = {id(lead) for lead in streamed_leads}
+        counts = {}
+        for future, source in futures.items():
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"error": str(e)}
+
+            if isinstance(result, dict) and "error" in result:
+                print(f"   [MultiSource] {source} failed: {result['error']}")
+                errors[source] = result['error']
+                continue
+
+            leads = result.get('leads', []) if isinstance(result, dict) else (result or [])
+            counts[source] = len(leads)
+            # Scrapers that don't stream every lead through on_lead still get merged
+            for lead in leads:
+                if id(lead) not in streamed:
+                    merger.add(lead)
+
+        if not counts:
+            return {"error": "; ".join(f"{s}: {e}" for s, e in errors.items())}
+
+        print(f"   --> [MultiSource] {len(merger.leads)} leads from {sum(counts.values())} source results.")
+        return {
+            "leads": merger.leads,
+            "meta": {"current_page": 1, "has_next": False, "sources": counts, "errors": errors}
+        }
@@ -0,0 +1,154 @@
+# scrapers/politeness.py
+import os
+import time
+import asyncio
+from email.utils import parsedate_to_datetime
+from urllib.robotparser import RobotFileParser
+
+# Responses that mean "slow down" rather than "this page is broken"
+BACKOFF_STATUSES = (403, 429, 503)
+
+
+def parse_retry_after(value):
+    """Retry-After is either a number of seconds or an HTTP date. Returns seconds or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _parse_domain_delays(spec):
+    """'yellowpages.com=1.5,example.org=3' -> {'yellowpages.com': 1.5, 'example.org': 3.0}"""
+    delays = {}
+    for item in (spec or '').split(','):
+        host, _, seconds = item.partition('=')
+        try:
+            delays[host.strip().lower()] = float(seconds)
+        except ValueError:
+            continue
+    return delays
+
+
+class _HostState:
+    __slots__ = ('interval', 'next_slot', 'blocked_until', 'failures', 'robots_checked', 'last_used')
+
+    def __init__(self, interval):
+        self.interval = interval      # minimum seconds between request starts
+        self.next_slot = 0.0          # loop time the next request may start
+        self.blocked_until = 0.0      # set by 429/403/503 backoff
+        self.failures = 0
+        self.robots_checked = False
+        self.last_used = 0.0
+
+
+class PolitenessScheduler:
+    """
+    Per-host request pacing for the fetch engine (runs on the engine loop).
+
+    Each host has its own queue of start times spaced POLITE_MIN_DELAY apart.
+    The gap is longer when robots.txt asks for a Crawl-delay, or when the host
+    is listed in POLITE_DOMAIN_DELAYS. A 403/429/503 puts the host in backoff
+    for Retry-After seconds, or exponentially longer on repeated failures,
+    capped at POLITE_MAX_BACKOFF.
+
+    Waiting happens before a request takes a global connection slot, so a
+    slow or blocked host only delays its own requests and other hosts keep
+    the engine busy.
+    """
+
+    MAX_HOSTS = 20000          # host states kept before idle ones are pruned
+    BACKOFF_BASE = 5.0
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.min_delay = float(os.environ.get('POLITE_MIN_DELAY', 0.25))
+        self.max_backoff = float(os.environ.get('POLITE_MAX_BACKOFF', 120))
+        self.max_crawl_delay = float(os.environ.get('POLITE_MAX_CRAWL_DELAY', 10))
+        self.use_robots = os.environ.get('POLITE_ROBOTS', 'true').lower() == 'true'
+        self.domain_delays = _parse_domain_delays(
+            os.environ.get('POLITE_DOMAIN_DELAYS', 'yellowpages.com=1')
+        )
+        self._hosts = {}
+
+    def _configured_delay(self, host):
+        for domain, delay in self.domain_delays.items():
+            if host == domain or host.endswith('.' + domain):
+                return max(delay, self.min_delay)
+        return self.min_delay
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            if len(self._hosts) >= self.MAX_HOSTS:
+                self._prune()
+            state = self._hosts[host] = _HostState(self._configured_delay(host))
+        return state
+
+    def _prune(self):
+        now = asyncio.get_running_loop().time()
+        idle = [h for h, s in self._hosts.items()
+                if s.blocked_until < now and s.next_slot < now and now - s.last_used > 600]
+        for host in idle:
+            del self._hosts[host]
+
+    async def wait_turn(self, host, scheme='https'):
+        """Waits until `host` may be sent another request, and books that slot."""
+        loop = asyncio.get_running_loop()
+        state = self._state(host)
+
+        if self.use_robots and not state.robots_checked:
+            # First contact: look up Crawl-delay in the background, don't hold this request up
+            state.robots_checked = True
+            asyncio.ensure_future(self._load_crawl_delay(host, scheme, state))
+
+        now = loop.time()
+        start = max(now, state.next_slot, state.blocked_until)
+        state.next_slot = start + state.interval
+        state.last_used = start
+        if start > now:
+            await asyncio.sleep(start - now)
+
+        # A backoff may have started while we were queued
+        while state.blocked_until > loop.time():
+            await asyncio.sleep(state.blocked_until - loop.time())
+
+    def record(self, host, status_code, headers=None):
+        """
+        Feeds a response back into the host's schedule.
+        Returns the backoff in seconds it triggered (0 if none).
+        """
+        state = self._state(host)
+        if status_code not in BACKOFF_STATUSES:
+            state.failures = 0
+            return 0
+
+        state.failures += 1
+        retry_after = parse_retry_after((headers or {}).get('retry-after'))
+        pause = retry_after if retry_after is not None else self.BACKOFF_BASE * 2 ** (state.failures - 1)
+        pause = min(pause, self.max_backoff)
+
+        loop = asyncio.get_running_loop()
+        state.blocked_until = max(state.blocked_until, loop.time() + pause)
+        print(f"   [polite] {host} answered {status_code}, backing off {pause:.0f}s")
+        return pause
+
+    async def _load_crawl_delay(self, host, scheme, state):
+        try:
+            response = await self.engine.fetch(
+                f"{scheme}://{host}/robots.txt", timeout=5, max_bytes=64 * 1024,
+                html_only=False, polite=False
+            )
+            if response.status_code != 200 or not response.content:
+                return
+            parser = RobotFileParser()
+            parser.parse(response.content.decode('utf-8', errors='ignore').splitlines())
+            delay = parser.crawl_delay('*')
+            if delay:
+                state.interval = max(state.interval, min(float(delay), self.max_crawl_delay))
+        except Exception:
+            pass
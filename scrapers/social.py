@@ -1,10 +1,9 @@
 # scrapers/social.py
 from .base_scraper import BaseScraper
 from .google import GoogleScraper
-from ddgs import DDGS
-import re
-import os
-from ai_extractor import extract_business_info
+from .duckduckgo import ddg_text
+from .contacts import first_email
+from ai_extractor import ai_service
 
 class SocialMediaScraper(BaseScraper):
     def __init__(self, platform, backend='google'):
@@ -20,15 +19,11 @@ class SocialMediaScraper(BaseScraper):
 
     def _parse_snippet_with_ai(self, snippet, title, url):
         """
-        Uses AI to extract info from the search snippet text.
+        Queues the search snippet for AI extraction. Returns a future (dict or None).
         """
-        try:
-            # We reuse the extractor but pass the Snippet as the "Page Text"
-            # The AI is smart enough to understand it's a short text.
-            data = extract_business_info(f"Title: {title}\nSnippet: {snippet}", url)
-            return data
-        except Exception:
-            return None
+        # We reuse the extractor but pass the Snippet as the "Page Text"
+        # The AI is smart enough to understand it's a short text.
+        return ai_service.submit(f"Title: {title}\nSnippet: {snippet}", url)
 
     def search(self, query, location, api_key=None, cx=None, page=1, proxy=None):
         # 1. Determine the "Dork" (Site Operator)
@@ -56,6 +51,9 @@ class SocialMediaScraper(BaseScraper):
         if self.backend == 'google':
             # Delegate to existing Google Scraper
             # The GoogleScraper has already been updated to return 'Phone' in its results.
+            self.scraper.on_lead = self.on_lead
+            self.scraper.on_progress = self.on_progress
+            self.scraper.site_registry = self.site_registry
             return self.scraper.search(dork_query, location, api_key, cx, page)
 
         # ---------------------------------------------------------
@@ -64,22 +62,31 @@ class SocialMediaScraper(BaseScraper):
         else:
             try:
                 # Use DDGS directly to avoid the 'Junk Domain' filter in our main DuckDuckGoScraper
-                with DDGS() as ddgs:
-                    # Fetch results (approx 20 per request)
-                    results = list(ddgs.text(
-                        dork_query, 
-                        region='wt-wt', 
-                        safesearch='off', 
-                        timelimit=None,
-                        max_results=25 
-                    ))
+                # `proxy` pins one egress proxy; otherwise the shared proxy pool picks one
+                # Fetch results (approx 20 per request)
+                results = ddg_text(
+                    dork_query,
+                    proxy=proxy,
+                    region='wt-wt',
+                    safesearch='off',
+                    timelimit=None,
+                    max_results=25
+                )
 
                 print(f"   --> Found {len(results)} raw social profiles.")
 
-                for res in results:
+                # Queue every snippet up front; ai_service paces them at the full Gemini quota
+                ai_futures = {}
+                if ai_service.is_configured():
+                    for i, res in enumerate(results):
+                        if res.get('href', 'N/A') != 'N/A':
+                            ai_futures[i] = self._parse_snippet_with_ai(
+                                res.get('body', ''), res.get('title', 'Unknown'), res.get('href')
+                            )
+
+                for i, res in enumerate(results):
                     title = res.get('title', 'Unknown')
                     link = res.get('href', 'N/A')
-                    snippet = res.get('body', '')
 
                     # Skip if no link
                     if link == 'N/A': continue
@@ -90,9 +97,12 @@ class SocialMediaScraper(BaseScraper):
                     source_label = f"Social ({self.platform})"
 
                     # --- 1. AI EXTRACTION (Snippet) ---
-                    if os.environ.get('GEMINI_API_KEY'):
+                    if i in ai_futures:
                         # AI reads the snippet to find Name, Job Title, Email
-                        ai_data = self._parse_snippet_with_ai(snippet, title, link)
+                        try:
+                            ai_data = ai_futures[i].result()
+                        except Exception:
+                            ai_data = None
 
                         if ai_data:
                             if ai_data.get('email'): 
@@ -113,21 +123,22 @@ class SocialMediaScraper(BaseScraper):
                     # --- 2. FALLBACK: REGEX EXTRACTION ---
                     # If AI didn't find email (or key missing), try Regex on the snippet
                     if email == "N/A":
-                        # Simple regex for finding emails in the snippet text
-                        emails = re.findall(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-z]{2,}", snippet)
-                        if emails:
-                            email = emails[0] # Take the first one found
+                        email = first_email(res.get('body', '')) or "N/A"
 
                     # Add to list if we found an email or if it's a valid profile 
                     if email != "N/A": 
-                        leads.append({
+                        lead = {
                             "Name": name,
                             "Email": email,
                             "Phone": phone, # <--- NEW FIELD
                             "Website": link,
                             "Location": location,
                             "Source": source_label
-                        })
+                        }
+                        leads.append(lead)
+                        self.emit_lead(lead)
+
+                    self.emit_progress(i + 1, len(results))
 
             except Exception as e:
                 print(f"Social Scraper Error: {e}")
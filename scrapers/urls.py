@@ -0,0 +1,141 @@
+# scrapers/urls.py
+import os
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = {
+    'gclid', 'gbraid', 'wbraid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'srsltid', 'ref', 'ref_src', 'trk',
+}
+TRACKING_PREFIXES = ('utm_', 'pk_', 'hsa_')
+
+# Public suffixes with two labels, where the registrable domain is three labels
+# (acme.co.uk). Not the full public suffix list, just the ones our searches hit.
+SECOND_LEVEL_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'me.uk', 'ltd.uk', 'plc.uk',
+    'com.au', 'net.au', 'org.au', 'co.nz', 'org.nz', 'co.za', 'co.in', 'co.jp',
+    'com.br', 'com.mx', 'com.ar', 'com.sg', 'com.my', 'com.ph', 'com.cn', 'com.hk',
+    'com.tr', 'co.il', 'co.kr',
+}
+
+# Hosting platforms where every subdomain is somebody else's site (the private
+# section of the public suffix list): acme.wixsite.com and bob.wixsite.com are two
+# businesses, not one. Again only the ones small-business searches turn up.
+PRIVATE_SUFFIXES = {
+    'wixsite.com', 'business.site', 'square.site', 'weebly.com', 'blogspot.com',
+    'github.io', 'myshopify.com', 'wordpress.com', 'squarespace.com', 'godaddysites.com',
+    'webflow.io', 'netlify.app', 'vercel.app', 'herokuapp.com', 'pages.dev', 'web.app',
+    'firebaseapp.com', 'azurewebsites.net', 'carrd.co', 'jimdosite.com', 'mystrikingly.com',
+    'yolasite.com', 'tumblr.com', 'site123.me', 'ueniweb.com', 'sites.google.com',
+}
+
+# How scrapers dedupe search results before deep-scraping: 'domain' (one fetch per
+# registrable domain) or 'url' (one per page)
+DEDUP_SCOPE = os.environ.get('URL_DEDUP_SCOPE', 'domain').lower()
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def _clean_query(query):
+    return [(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if not _is_tracking_param(k)]
+
+
+def _host_and_netloc(parts, scheme):
+    host = (parts.hostname or '').lower().rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        return host, f"{host}:{port}"
+    return host, host
+
+
+def normalize_url(url):
+    """
+    Canonical form of a URL for cache keys and dedup:
+    lowercase scheme/host, no 'www.', no default port, no fragment,
+    no tracking parameters, sorted query string and no trailing slash.
+    """
+    if not url:
+        return url
+
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'http').lower()
+    _, netloc = _host_and_netloc(parts, scheme)
+
+    path = parts.path.rstrip('/')
+    query = urlencode(sorted(_clean_query(parts.query)))
+
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def clean_url(url):
+    """
+    The URL to actually fetch: same page, minus the fragment and tracking
+    parameters. Scheme, host and path are left alone so redirects still work.
+    """
+    if not url:
+        return url
+
+    parts = urlsplit(url.strip())
+    query = urlencode(_clean_query(parts.query))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+
+def registrable_domain(host):
+    """
+    'shop.acme.co.uk' -> 'acme.co.uk', 'www.blog.acme.com' -> 'acme.com',
+    'shop.acme.wixsite.com' -> 'acme.wixsite.com'.
+    IP addresses, single-label hosts and bare platform hosts come back unchanged.
+    """
+    host = (host or '').lower().rstrip('.').split(':')[0]
+    labels = host.split('.')
+    if host.replace('.', '').isdigit():
+        return host
+    for index in range(len(labels)):
+        if '.'.join(labels[index:]) in PRIVATE_SUFFIXES:
+            return '.'.join(labels[max(index - 1, 0):])
+    if len(labels) <= 2:
+        return host
+    if '.'.join(labels[-2:]) in SECOND_LEVEL_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def dedup_key(url, scope=None):
+    """
+    Key under which two search results count as the same site.
+
+    Scheme, 'www.', trailing slash, fragment and tracking parameters never
+    matter. With scope 'domain' (the default, URL_DEDUP_SCOPE) everything on one
+    registrable domain collapses together, so 'https://x.com/contact' and
+    'http://blog.x.com/?utm_source=y' are one site; with 'url' only the
+    same page does. Sites on a hosting platform are told apart by their
+    subdomain, and pages on the platform's own host (sites.google.com/view/...)
+    are always keyed per page.
+    """
+    if not url:
+        return None
+
+    parts = urlsplit(url.strip() if '//' in url else f"//{url.strip()}")
+    scheme = (parts.scheme or 'http').lower()
+    host, netloc = _host_and_netloc(parts, scheme)
+    if not host:
+        return None
+
+    if (scope or DEDUP_SCOPE) == 'domain':
+        domain = registrable_domain(host)
+        if domain not in PRIVATE_SUFFIXES:
+            return netloc.replace(host, domain, 1)
+
+    path = parts.path.rstrip('/')
+    query = urlencode(sorted(_clean_query(parts.query)))
+    return f"{netloc}{path}?{query}" if query else f"{netloc}{path}"
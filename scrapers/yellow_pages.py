@@ -1,151 +1,235 @@
 # scrapers/yellow_pages.py
-from curl_cffi import requests
 from bs4 import BeautifulSoup
-import re
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 import os
 from .base_scraper import BaseScraper
-from ai_extractor import extract_business_info
+from .fetcher import fetch_engine
+from .cache import page_cache
+from .html_extract import extract_page, SOUP_PARSER
+from .contacts import find_emails, ContactSignalDetector
+from .filters import junk_filter
+from .crawler import site_crawler, site_domain, is_site_email
+from .urls import clean_url
+from ai_extractor import ai_service
 
 class YellowPagesScraper(BaseScraper):
-    # Regex for finding emails in text
-    EMAIL_REGEX = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
-
-    # Ignore these generic/junk emails
-    JUNK_EMAILS = {
-        'dmca', 'privacy', 'accessibility', 'abuse', 'noreply', 
-        'webmaster', 'admin', 'help', 'jobs', 'careers', 'media', 
-        'press', 'news', 'support'
-    }
-
-    def _is_junk_email(self, email):
-        """Check if email is a generic/junk address."""
-        email_lower = email.lower()
-        for junk in self.JUNK_EMAILS:
-            if junk in email_lower:
-                return True
-        # Check for image extensions or common false positives
-        if email_lower.endswith(('.png', '.jpg', '.jpeg', '.gif', '.css', '.js', '.svg')):
-            return True
-        return False
-
-    def _decode_cf_email(self, cf_email_link):
-        """Decodes Cloudflare's encrypted email string."""
-        try:
-            # Extract the hash part after the #
-            if '#' in cf_email_link:
-                encoded_string = cf_email_link.split('#')[1]
-            else:
-                encoded_string = cf_email_link
-
-            # The first 2 hex chars are the "key"
-            r = int(encoded_string[:2], 16)
-            email = ''.join([chr(int(encoded_string[i:i+2], 16) ^ r) 
-                             for i in range(2, len(encoded_string), 2)])
-            return email
-        except Exception:
-            return None
-
-    def _scrape_yp_internal_profile(self, yp_url):
+    # How many result cards are enriched at once (profile + website lookups)
+    CARD_WORKERS = int(os.environ.get('YP_CARD_WORKERS', 10))
+    # Result listings are big pages and the whole thing is needed
+    LISTING_MAX_BYTES = 4 * 1024 * 1024
+    # Most listing pages one batch search will walk through
+    BATCH_MAX_PAGES = int(os.environ.get('YP_BATCH_MAX_PAGES', 20))
+    SEARCH_URL = "https://www.yellowpages.com/search"
+
+    async def _scrape_yp_internal_profile(self, yp_url):
         """
         Visits the specific YellowPages.com profile page to find hidden emails.
         """
         if not yp_url: return None
 
         try:
-            response = requests.get(yp_url, impersonate="chrome110", timeout=10)
+            cached = await fetch_engine.run_blocking(page_cache.get, 'yp-profile', yp_url)
+            if cached and cached['fresh']:
+                return cached['result']
+
+            response = await fetch_engine.fetch(yp_url)
             if response.status_code != 200: return None
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+            email = await fetch_engine.run_cpu(self._parse_yp_profile, response.content)
+            await fetch_engine.run_blocking(
+                page_cache.set, 'yp-profile', yp_url, email, page_cache.digest(response.content)
+            )
+            return email
 
-            # 1. Check for Cloudflare Encrypted Links first
-            cf_link = soup.select_one('a[href*="/cdn-cgi/l/email-protection"]')
-            if cf_link:
-                decoded = self._decode_cf_email(cf_link['href'])
-                if decoded and not self._is_junk_email(decoded):
-                    return decoded
+        except Exception:
+            pass
+        return None
 
-            # 2. Check for standard 'Email Business' button
-            email_btn = soup.select_one('a.email-business')
-            if email_btn and email_btn.get('href'):
-                email = email_btn.get('href').replace('mailto:', '').split('?')[0]
-                return email
+    @staticmethod
+    def _parse_yp_profile(content):
+        """Pulls the email out of a YP profile page. Runs on a parse worker (thread or process)."""
+        page = extract_page(content)
 
-            # 3. Fallback: Any mailto link
-            for link in soup.select('a[href^="mailto:"]'):
-                email = link.get('href').replace('mailto:', '').split('?')[0]
-                if not self._is_junk_email(email):
-                    return email
+        # 1. Cloudflare encrypted links first, then the 'Email Business' button / any mailto link
+        for email in page.cf_emails + page.mailto:
+            if not junk_filter.is_junk_email(email):
+                return email
 
-        except Exception:
-            pass
         return None
 
-    def _scrape_external_website(self, url):
+    async def _scrape_external_website(self, url):
         """
         Visits the business's own website to find emails using AI or Regex.
         Returns a DICTIONARY with type and data.
         """
-        if not url or "yellowpages.com" in url or url == "N/A": return None
+        if not url or url == "N/A" or junk_filter.is_junk_url(url): return None
 
-        print(f"   --> Deep Scraping Website: {url}")
         try:
-            response = requests.get(url, impersonate="chrome110", timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            page_text = soup.get_text(separator=' ', strip=True)
-
-            # ---------------------------------------------------------
-            # AI MODE: Gemini Integration
-            # ---------------------------------------------------------
-            if os.environ.get('GEMINI_API_KEY'):
-                ai_data = extract_business_info(page_text, url)
-                if ai_data and (ai_data.get('email') or ai_data.get('phone')):
-                    return {
-                        "type": "ai",
-                        "data": ai_data
-                    }
-            # ---------------------------------------------------------
-
-            # FALLBACK: Standard Logic
-            found_email = None
-
-            # 1. Check for Cloudflare Encrypted Links
-            cf_links = soup.select('a[href*="/cdn-cgi/l/email-protection"]')
-            for link in cf_links:
-                decoded = self._decode_cf_email(link['href'])
-                if decoded and not self._is_junk_email(decoded):
-                    found_email = decoded
-                    break
+            # Seen this site recently? Skip the network entirely.
+            cache_ns = page_cache.namespace('yp')
+            cached = await fetch_engine.run_blocking(page_cache.get, cache_ns, url)
+            if cached and cached['fresh']:
+                return cached['result']
+
+            print(f"   --> Deep Scraping Website: {url}")
+            # Regex mode only needs an email here (the phone comes from the YP card)
+            stop_when = None
+            if not ai_service.is_configured():
+                stop_when = ContactSignalDetector(
+                    urlparse(url).hostname, need_phone=False, junk_domains=junk_filter.domains
+                )
+            response = await fetch_engine.fetch(url, stop_when=stop_when)
+            if not response.content: return None
+
+            # Stale entry but the page hasn't changed: reuse it instead of re-parsing
+            digest = page_cache.digest(response.content)
+            if cached and cached['html_digest'] == digest:
+                result = cached['result']
+            else:
+                result = await self._analyze_external_page(response.content, url)
 
-            # 2. Check Home Page for 'mailto:'
-            if not found_email:
-                for link in soup.select('a[href^="mailto:"]'):
-                    email = link.get('href').replace('mailto:', '').split('?')[0]
-                    if not self._is_junk_email(email):
-                        found_email = email
-                        break
-
-            # 3. Check regex in text
-            if not found_email:
-                text_emails = set(re.findall(self.EMAIL_REGEX, page_text))
-                for email in text_emails:
-                    if not self._is_junk_email(email):
-                        found_email = email
-                        break
-
-            if found_email:
-                return {"type": "regex", "email": found_email}
+            await fetch_engine.run_blocking(page_cache.set, cache_ns, url, result, digest)
+            return result
 
         except Exception:
             pass
         return None
 
-    def search(self, query, location, api_key=None, cx=None, page=1):
+    async def _analyze_external_page(self, content, url):
+        """Parses the business website on a worker thread, then asks Gemini if AI mode is on."""
+        page = await fetch_engine.run_cpu(self._parse_external_page, content, url)
+
+        # ---------------------------------------------------------
+        # AI MODE: Gemini Integration
+        # ---------------------------------------------------------
+        if ai_service.is_configured():
+            ai_data = await ai_service.aextract(page['text'], url)
+            if ai_data and (ai_data.get('email') or ai_data.get('phone')):
+                return {
+                    "type": "ai",
+                    "data": ai_data
+                }
+        # ---------------------------------------------------------
+
+        email = page['email']
+
+        # No on-site email on the homepage: try its best contact/about pages
+        domain = site_domain(url)
+        if not (email and is_site_email(email, domain)):
+            crawl = await site_crawler.crawl(url, page['links'], need_phone=False)
+            crawl_emails = [e for e in crawl['emails'] if not junk_filter.is_junk_email(e)]
+            if crawl_emails and (not email or is_site_email(crawl_emails[0], domain)):
+                email = crawl_emails[0]
+
+        if email:
+            return {"type": "regex", "email": email}
+        return None
+
+    @staticmethod
+    def _parse_external_page(content, url=None):
+        """Single-pass parse + regex over the business website. Runs on a parse worker (thread or process)."""
+        page = extract_page(content, url)
+
+        # FALLBACK: Standard Logic
+        found_email = None
+
+        # 1. Check for Cloudflare Encrypted Links, then 2. 'mailto:' links
+        for email in page.cf_emails + page.mailto:
+            if not junk_filter.is_junk_email(email):
+                found_email = email
+                break
+
+        # 3. Check regex in text
+        if not found_email:
+            for email in find_emails(page.text):
+                if not junk_filter.is_junk_email(email):
+                    found_email = email
+                    break
+
+        return {"text": page.text, "email": found_email, "links": page.contact_links}
+
+    @staticmethod
+    def _parse_card(card):
+        """Basic info straight from a YP result card."""
+        name_tag = card.select_one('.business-name')
+        name = name_tag.get_text(strip=True) if name_tag else "Unknown"
+
+        phone_tag = card.select_one('.phones')
+        phone = phone_tag.get_text(strip=True) if phone_tag else "N/A"
+
+        # URLs
+        yp_suffix = name_tag['href'] if name_tag else None
+        yp_full_url = urljoin("https://www.yellowpages.com", yp_suffix) if yp_suffix else None
+
+        web_tag = card.select_one('.links a.track-visit-website')
+        external_website = clean_url(web_tag['href']) if web_tag else "N/A"
+
+        return {
+            "name": name,
+            "phone": phone,
+            "yp_url": yp_full_url,
+            "website": external_website
+        }
+
+    def _build_lead(self, info, location, page, email="N/A", source_note=None):
+        # --- FIX: Return Phone as separate key ---
+        return {
+            "Name": info['name'],
+            "Email": email,
+            "Phone": info['phone'],  # <--- SEPARATE COLUMN
+            "Website": info['website'],
+            "Location": location,
+            "Source": source_note or f"YellowPages (Pg {page})"
+        }
+
+    async def _enrich_card(self, info, location, page):
+        """Looks up the email for one card (YP profile, then the business site)."""
+        info = dict(info)
+        email = "N/A"
+        source_note = f"YellowPages (Pg {page})"
+        external_website = info['website']
+
+        # 1. STRATEGY A: Check Internal YP Profile First
+        if info['yp_url']:
+            email = await self._scrape_yp_internal_profile(info['yp_url']) or "N/A"
+
+        # 2. STRATEGY B: Check External Website (Deep Scrape / AI)
+        # (skipped when another source in a multi-source search already has the site)
+        if (external_website != "N/A" and (email == "N/A" or ai_service.is_configured())
+                and self.claim_site(external_website)):
+            found_data = await self._scrape_external_website(external_website)
+
+            if found_data:
+                if found_data['type'] == 'ai':
+                    d = found_data['data']
+
+                    # Prioritize AI Email
+                    if d.get('email'): 
+                        email = d.get('email')
+
+                    # Enrich Name
+                    if d.get('business_name'): 
+                        info['name'] = d.get('business_name')
+
+                    # Enrich Phone
+                    if d.get('phone'):
+                        info['phone'] = d.get('phone')
+
+                    # Add Industry to Source
+                    if d.get('industry'):
+                        source_note = f"YP (AI: {d.get('industry')})"
+
+                elif found_data['type'] == 'regex':
+                    if email == "N/A":
+                        email = found_data['email']
+
+        return self._build_lead(info, location, page, email, source_note)
+
+    async def _load_listing(self, query, location, page):
         """
-        Scrapes a SPECIFIC page number and returns leads + metadata.
+        Fetches and parses one YP results page.
+        Returns {"cards": [...], "total_pages_estimate", "has_next"} or {"error": "..."}.
         """
-        results = []
-        base_url = "https://www.yellowpages.com/search"
         params = {
             "search_terms": query, 
             "geo_location_terms": location, 
@@ -154,107 +238,150 @@ class YellowPagesScraper(BaseScraper):
 
         print(f"--- [YellowPages] Scraping Page {page}... ---")
 
+        response = await fetch_engine.fetch(
+            self.SEARCH_URL,
+            params=params,
+            timeout=15,
+            max_bytes=self.LISTING_MAX_BYTES,
+            retries=2
+        )
+
+        # Still blocked after the politeness backoff retries
+        if response.status_code == 403:
+            return {"error": "YP Blocked your IP. Restart router or wait."}
+
+        if response.status_code != 200:
+             return {"error": f"YP Error Code: {response.status_code}"}
+
+        return await fetch_engine.run_cpu(self._parse_listing, response.content, page)
+
+    @staticmethod
+    def _parse_listing(content, page):
+        soup = BeautifulSoup(content, SOUP_PARSER)
+        cards = soup.select('.result')
+
+        # --- PAGINATION ESTIMATION ---
+        total_pages_estimate = 1
+        pagination = soup.select_one('.pagination')
+        if pagination:
+            page_links = pagination.select('a')
+            page_nums = []
+            for link in page_links:
+                txt = link.get_text(strip=True)
+                if txt.isdigit():
+                    page_nums.append(int(txt))
+            if page_nums:
+                total_pages_estimate = max(page_nums)
+
+        return {
+            "cards": [YellowPagesScraper._parse_card(card) for card in cards],
+            "total_pages_estimate": total_pages_estimate,
+            "has_next": (int(page) < total_pages_estimate) or (len(cards) >= 30)
+        }
+
+    def _enrich_cards(self, card_infos, location, page, done_before=0, total=None):
+        """
+        Enriches every card concurrently. YP profile pages all live on one host,
+        so the engine's per-host limit keeps those polite.
+        Leads are emitted as each card finishes, but returned in card order.
+        """
+        total = total or len(card_infos)
+        enriched = [None] * len(card_infos)
+        completed = done_before
+        for index, lead in fetch_engine.map_as_completed(
+            lambda i: self._enrich_card(card_infos[i], location, page),
+            range(len(card_infos)), limit=self.CARD_WORKERS
+        ):
+            # If enrichment blew up, still keep the basic YP listing
+            enriched[index] = lead or self._build_lead(card_infos[index], location, page)
+            self.emit_lead(enriched[index])
+            completed += 1
+            self.emit_progress(completed, total)
+        return enriched
+
+    def search(self, query, location, api_key=None, cx=None, page=1):
+        """
+        Scrapes a SPECIFIC page number and returns leads + metadata.
+        """
         try:
-            response = requests.get(
-                base_url, 
-                params=params, 
-                impersonate="chrome110", 
-                timeout=15
-            )
+            listing = fetch_engine.run(self._load_listing, query, location, page)
+            if "error" in listing:
+                return listing
 
-            if response.status_code == 403:
-                return {"error": "YP Blocked your IP. Restart router or wait."}
-
-            if response.status_code != 200:
-                 return {"error": f"YP Error Code: {response.status_code}"}
-
-            soup = BeautifulSoup(response.content, 'html.parser')
-            cards = soup.select('.result')
-
-            # --- PAGINATION ESTIMATION ---
-            total_pages_estimate = 1
-            pagination = soup.select_one('.pagination')
-            if pagination:
-                page_links = pagination.select('a')
-                page_nums = []
-                for link in page_links:
-                    txt = link.get_text(strip=True)
-                    if txt.isdigit():
-                        page_nums.append(int(txt))
-                if page_nums:
-                    total_pages_estimate = max(page_nums)
-
-            # --- SCRAPE CARDS ---
-            for card in cards:
-                # Basic Info from Yellow Pages
-                name_tag = card.select_one('.business-name')
-                name = name_tag.get_text(strip=True) if name_tag else "Unknown"
-
-                phone_tag = card.select_one('.phones')
-                phone = phone_tag.get_text(strip=True) if phone_tag else "N/A"
-
-                # URLs
-                yp_suffix = name_tag['href'] if name_tag else None
-                yp_full_url = urljoin("https://www.yellowpages.com", yp_suffix) if yp_suffix else None
-
-                web_tag = card.select_one('.links a.track-visit-website')
-                external_website = web_tag['href'] if web_tag else "N/A"
-
-                email = "N/A"
-                source_note = f"YellowPages (Pg {page})"
-
-                # 1. STRATEGY A: Check Internal YP Profile First
-                if yp_full_url:
-                    email = self._scrape_yp_internal_profile(yp_full_url) or "N/A"
-
-                # 2. STRATEGY B: Check External Website (Deep Scrape / AI)
-                if external_website != "N/A" and (email == "N/A" or os.environ.get('GEMINI_API_KEY')):
-                    found_data = self._scrape_external_website(external_website)
-
-                    if found_data:
-                        if found_data['type'] == 'ai':
-                            d = found_data['data']
-
-                            # Prioritize AI Email
-                            if d.get('email'): 
-                                email = d.get('email')
-
-                            # Enrich Name
-                            if d.get('business_name'): 
-                                name = d.get('business_name')
-
-                            # Enrich Phone
-                            if d.get('phone'):
-                                phone = d.get('phone')
-
-                            # Add Industry to Source
-                            if d.get('industry'):
-                                source_note = f"YP (AI: {d.get('industry')})"
-
-                        elif found_data['type'] == 'regex':
-                            if email == "N/A":
-                                email = found_data['email']
-
-                # --- FIX: Return Phone as separate key ---
-                results.append({
-                    "Name": name,
-                    "Email": email,
-                    "Phone": phone,  # <--- SEPARATE COLUMN
-                    "Website": external_website,
-                    "Location": location,
-                    "Source": source_note
-                })
+            results = self._enrich_cards(listing['cards'], location, page)
 
             # RETURN STRUCTURE WITH METADATA
             return {
                 "leads": results,
                 "meta": {
                     "current_page": int(page),
-                    "total_pages_estimate": total_pages_estimate,
-                    "has_next": (int(page) < total_pages_estimate) or (len(cards) >= 30)
+                    "total_pages_estimate": listing['total_pages_estimate'],
+                    "has_next": listing['has_next']
                 }
             }
 
         except Exception as e:
             print(f"Error: {e}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+
+    def search_batch(self, query, location, start_page=1, max_pages=None):
+        """
+        Scrapes pages start_page.. in one go, until a page has no next page or
+        max_pages (capped at YP_BATCH_MAX_PAGES) have been read. A page has a
+        next one when its pagination links go further or it came back full
+        (30 cards): YP only links a window of pages, so the estimate is a floor. The next listing page is fetched while the current
+        page's cards are being enriched, so there's no gap between pages.
+        Returns the same {"leads", "meta"} shape as search(); meta also has
+        "start_page", "pages_scraped" and, if a later page failed, "stopped_reason".
+        """
+        start_page = int(start_page)
+        max_pages = min(int(max_pages or self.BATCH_MAX_PAGES), self.BATCH_MAX_PAGES)
+        last_allowed = start_page + max_pages - 1
+
+        results = []
+        page = start_page
+        meta = {"start_page": start_page, "current_page": start_page, "total_pages_estimate": 1,
+                "has_next": False, "pages_scraped": 0}
+
+        try:
+            listing = fetch_engine.run(self._load_listing, query, location, page)
+            if "error" in listing:
+                return listing
+
+            while True:
+                meta['total_pages_estimate'] = max(meta['total_pages_estimate'], listing['total_pages_estimate'])
+
+                # Prefetch the next listing page while this one's cards are enriched
+                next_listing = None
+                if listing['has_next'] and listing['cards'] and page < last_allowed:
+                    next_listing = fetch_engine.submit(self._load_listing, query, location, page + 1)
+
+                # Progress counts cards across the batch; the total grows as pages arrive
+                total = len(results) + len(listing['cards'])
+                results.extend(self._enrich_cards(listing['cards'], location, page, len(results), total))
+
+                meta['current_page'] = page
+                meta['has_next'] = listing['has_next'] and bool(listing['cards'])
+                meta['pages_scraped'] += 1
+
+                if next_listing is None:
+                    break
+                try:
+                    listing = next_listing.result()
+                except Exception as e:
+                    listing = {"error": str(e)}
+                if "error" in listing:
+                    # Keep what the earlier pages found; "Load Next" can pick up from here
+                    print(f"   [YellowPages] Stopping batch at page {page + 1}: {listing['error']}")
+                    meta['stopped_reason'] = listing['error']
+                    break
+                page += 1
+
+        except Exception as e:
+            print(f"Error: {e}")
+            if not results:
+                return {"error": str(e)}
+            meta['stopped_reason'] = str(e)
+
+        print(f"   --> [YellowPages] Batch done: {meta['pages_scraped']} pages, {len(results)} leads.")
+        return {"leads": results, "meta": meta}
@@ -0,0 +1,17 @@
+# worker.py
+# Runs RQ workers for the search queue:  python worker.py
+from redis import Redis
+from rq import Queue, Worker
+
+from app import app, startup
+from config import Config
+
+if __name__ == "__main__":
+    # The web process owns schema upgrades; two processes running them at once can collide
+    startup(migrate=False)
+    connection = Redis.from_url(Config.REDIS_URL)
+    queues = [Queue(name, connection=connection) for name in Config.QUEUES]
+
+    # Jobs touch the database, so they need the Flask app context
+    with app.app_context():
+        Worker(queues, connection=connection).work()